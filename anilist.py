@@ -0,0 +1,214 @@
+import asyncio
+import sys
+import traceback
+
+import aiohttp
+
+from cache import TieredCache, MISSING
+from http_client import loads
+
+api = 'https://graphql.anilist.co'
+
+fields = {
+    'ANIME': '''
+        id
+        idMal
+        description
+        title {
+          romaji
+          english
+        }
+        coverImage {
+          large
+        }
+        startDate {
+          year
+          month
+          day
+        }
+        endDate {
+          year
+          month
+          day
+        }
+        synonyms
+        format
+        status
+        episodes
+        duration
+        nextAiringEpisode {
+          episode
+        }
+        averageScore
+        meanScore
+        source
+        genres
+        tags {
+          name
+        }
+        studios(isMain: true) {
+          nodes {
+            name
+          }
+        }
+        siteUrl
+    ''',
+    'MANGA': '''
+        id
+        idMal
+        description
+        title {
+          romaji
+          english
+        }
+        coverImage {
+          large
+        }
+        startDate {
+          year
+          month
+          day
+        }
+        endDate {
+          year
+          month
+          day
+        }
+        status
+        chapters
+        volumes
+        averageScore
+        meanScore
+        genres
+        tags {
+          name
+        }
+        siteUrl
+    ''',
+}
+
+# Finished shows never change, airing ones get a new episode every week.
+ttl_by_status = {
+    'FINISHED': 7 * 86400,
+    'CANCELLED': 7 * 86400,
+    'HIATUS': 86400,
+    'NOT_YET_RELEASED': 6 * 3600,
+    'RELEASING': 3600,
+}
+not_found_ttl = 600
+
+
+class AniListError(Exception):
+    """AniList couldn't be reached or sent back something that isn't an answer."""
+
+
+class AniList:
+    """Cached AniList client.
+
+    Identical lookups share one in-flight request, and distinct lookups that
+    arrive within ``window`` seconds are sent as one aliased GraphQL document.
+    """
+
+    def __init__(self, http, *, cache_path='anilist_cache.sqlite3', window=0.05, max_batch=10):
+        self.http = http
+        self.cache = TieredCache(cache_path)
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = 0
+        self._inflight = {}
+        self._pending = []
+        self._flush_handle = None
+        self._sending = set()
+
+    def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for task in self._sending:
+            task.cancel()
+        self._pending = []
+        self._fail(list(self._inflight), AniListError('client closed'))
+        self.cache.close()
+
+    async def media(self, name, media_type):
+        key = '{}:{}'.format(media_type, ' '.join(name.casefold().split()))
+        data = self.cache.get(key)
+        if data is not MISSING:
+            return data
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = self._inflight[key] = loop.create_future()
+            self._pending.append((key, name, media_type))
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sent)
+
+    def _sent(self, task):
+        self._sending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            error = task.exception()
+            print('AniList batch failed:', file=sys.stderr)
+            traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+    def _fail(self, keys, error):
+        for key in keys:
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_exception(error)
+
+    async def _send(self, batch):
+        # Whatever goes wrong, every lookup in the batch has to be answered,
+        # or later calls for the same titles wait on a future nobody resolves.
+        try:
+            await self._send_batch(batch)
+        except AniListError as e:
+            self._fail([key for key, _, _ in batch], e)
+        except Exception as e:
+            self._fail([key for key, _, _ in batch], AniListError(repr(e)))
+            raise
+
+    async def _send_batch(self, batch):
+        params = ', '.join('$n{}: String'.format(i) for i in range(len(batch)))
+        body = '\n'.join(
+            'm{0}: Media(search: $n{0}, type: {1}) {{{2}}}'.format(i, media_type, fields[media_type])
+            for i, (_, _, media_type) in enumerate(batch)
+        )
+        query = 'query ({}) {{\n{}\n}}'.format(params, body)
+        variables = {'n{}'.format(i): name for i, (_, name, _) in enumerate(batch)}
+        self.requests += 1
+        results = await self._post(query, variables)
+        for i, (key, _, _) in enumerate(batch):
+            data = results.get('m{}'.format(i))
+            ttl = ttl_by_status.get(data['status'], 3600) if data else not_found_ttl
+            self.cache.set(key, data, ttl)
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+    async def _post(self, query, variables):
+        try:
+            async with self.http.session.post(api, json={'query': query, 'variables': variables}) as resp:
+                # A title that isn't found makes AniList answer 404 with that
+                # alias set to null, so a 404 can still carry results.
+                if resp.status not in (200, 404) or resp.content_type != 'application/json':
+                    raise AniListError(f'HTTP {resp.status} ({resp.content_type})')
+                response = loads(await resp.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise AniListError(repr(e)) from e
+        results = response.get('data') if isinstance(response, dict) else None
+        if results is None:
+            raise AniListError(response.get('errors') if isinstance(response, dict) else response)
+        return results
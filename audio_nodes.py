@@ -0,0 +1,311 @@
+import asyncio
+
+import discord
+
+from http_client import loads, dumps
+from tracks import TrackQueue, QueueMap
+
+
+class NoAudioNode(RuntimeError):
+    pass
+
+
+class Track:
+
+    def __init__(self, data):
+        info = data['info']
+        self.id = data['track']
+        self.name = info['title']
+        self.url = info['uri']
+        self.duration = info['length'] / 1000
+        self.is_looping = False
+
+
+class Node:
+    """Connection to one Lavalink-compatible audio worker.
+
+    The worker owns FFmpeg, Opus encoding and the voice UDP socket for every
+    guild it plays in; the bot only sends it control messages.
+    """
+
+    def __init__(self, http, host, port, password, *, name=None):
+        self.http = http
+        self.host = host
+        self.port = port
+        self.password = password
+        self.name = name or f'{host}:{port}'
+        self.players = {}
+        self.stats = None
+        self.ws = None
+        self._task = None
+
+    @property
+    def available(self):
+        return self.ws is not None and not self.ws.closed
+
+    @property
+    def penalty(self):
+        if self.stats is None:
+            return len(self.players)
+        load = self.stats.get('cpu', {}).get('systemLoad', 0)
+        return self.stats.get('playingPlayers', 0) + 1.05 ** (100 * load) * 10 - 10
+
+    async def connect(self, user_id, shard_count):
+        headers = {
+            'Authorization': self.password,
+            'User-Id': str(user_id),
+            'Num-Shards': str(shard_count),
+            'Client-Name': 'Nutcrack',
+        }
+        self.ws = await self.http.session.ws_connect(f'ws://{self.host}:{self.port}', headers=headers, heartbeat=30)
+
+    def start(self, user_id, shard_count):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._keep_connected(user_id, shard_count))
+
+    async def _keep_connected(self, user_id, shard_count, max_delay=60):
+        delay = 1
+        while True:
+            try:
+                await self.connect(user_id, shard_count)
+                print(f'Audio node {self.name} connected')
+                delay = 1
+                await self._listen()
+                print(f'Audio node {self.name} disconnected, reconnecting')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Audio node {self.name} unavailable ({e!r}), retrying in {delay}s')
+            # The node forgets its players when the socket drops, so leave
+            # their channels; the next play reconnects onto a live node.
+            for player in list(self.players.values()):
+                try:
+                    await player.guild.change_voice_state(channel=None)
+                except Exception:
+                    pass
+                player._forget()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def send(self, **payload):
+        await self.ws.send_str(dumps(payload))
+
+    async def _listen(self):
+        async for message in self.ws:
+            data = loads(message.data)
+            op = data.get('op')
+            if op == 'stats':
+                self.stats = data
+            elif op == 'event':
+                player = self.players.get(int(data['guildId']))
+                if player is not None:
+                    await player.on_node_event(data)
+
+    async def load_tracks(self, identifier):
+        data = await self.http.get_json(
+            f'http://{self.host}:{self.port}/loadtracks',
+            params={'identifier': identifier},
+            headers={'Authorization': self.password},
+        )
+        return [Track(track) for track in data.get('tracks', [])]
+
+
+class NodePool:
+
+    def __init__(self, http):
+        self.http = http
+        self.nodes = []
+
+    @classmethod
+    def from_config(cls, http, config):
+        # "host:port:password,host:port:password"
+        pool = cls(http)
+        for entry in filter(None, (part.strip() for part in config.split(','))):
+            host, port, password = entry.split(':', 2)
+            pool.nodes.append(Node(http, host, int(port), password))
+        return pool
+
+    def connect(self, user_id, shard_count):
+        # Each node connects, and reconnects, on its own, so one unreachable
+        # node doesn't hold up the others.
+        for node in self.nodes:
+            node.start(user_id, shard_count)
+
+    async def close(self):
+        for node in self.nodes:
+            await node.close()
+
+    def best(self):
+        nodes = [node for node in self.nodes if node.available]
+        if not nodes:
+            raise NoAudioNode('No audio node is connected')
+        return min(nodes, key=lambda node: node.penalty)
+
+
+class NodePlayer(discord.VoiceProtocol):
+    """Voice client that hands playback to an audio node.
+
+    Mirrors the parts of DiscordUtils' MusicPlayer the Music cog uses, so
+    the commands work the same with either backend.
+    """
+
+    def __init__(self, client, channel):
+        super().__init__(client, channel)
+        self.guild = channel.guild
+        self.node = client.audio_nodes.best()
+        self.node.players[self.guild.id] = self
+        self._queue = TrackQueue()
+        self._playing = False
+        self._paused = False
+        self._session_id = None
+        self._server = None
+        # Set by NodeMusic.create_player.
+        self.music = None
+
+    async def on_voice_state_update(self, data):
+        self._session_id = data['session_id']
+        if data['channel_id'] is None:
+            self._forget()
+            return
+        self.channel = self.guild.get_channel(int(data['channel_id']))
+        await self._send_voice()
+
+    async def on_voice_server_update(self, data):
+        self._server = data
+        await self._send_voice()
+
+    async def _send_voice(self):
+        if self._session_id and self._server:
+            await self.node.send(op='voiceUpdate', guildId=str(self.guild.id), sessionId=self._session_id, event=self._server)
+
+    async def connect(self, *, timeout, reconnect):
+        await self.guild.change_voice_state(channel=self.channel)
+
+    async def disconnect(self, *, force=False):
+        await self.guild.change_voice_state(channel=None)
+        await self.node.send(op='destroy', guildId=str(self.guild.id))
+        self._forget()
+
+    def _forget(self):
+        # Also reached when the bot is disconnected from outside (kicked,
+        # channel deleted) or the node drops, so the next play starts fresh.
+        self.node.players.pop(self.guild.id, None)
+        self._queue.clear()
+        self._playing = False
+        if self.music is not None:
+            self.music.forget(self)
+        self.cleanup()
+
+    def is_playing(self):
+        return self._playing and not self._paused
+
+    async def on_node_event(self, data):
+        # REPLACED/STOPPED ends come from our own skip/stop calls.
+        if data['type'] == 'TrackEndEvent' and data.get('reason') in ('FINISHED', 'LOAD_FAILED'):
+            await self._advance()
+        elif data['type'] in ('TrackExceptionEvent', 'TrackStuckEvent'):
+            await self._advance()
+
+    async def _advance(self):
+        if self._queue and not self._queue[0].is_looping:
+            self._queue.pop(0)
+        if self._queue:
+            await self.play()
+        else:
+            self._playing = False
+
+    async def load(self, url, search=False):
+        identifier = f'ytsearch:{url}' if search and not url.startswith(('http://', 'https://')) else url
+        tracks = await self.node.load_tracks(identifier)
+        if not tracks:
+            raise LookupError(url)
+        return tracks
+
+    async def queue(self, url, search=False, bettersearch=False):
+        track = (await self.load(url, search))[0]
+        self._queue.append(track)
+        return track
+
+    def extend(self, tracks):
+        self._queue.extend(tracks)
+
+    async def play(self):
+        track = self._queue[0]
+        await self.node.send(op='play', guildId=str(self.guild.id), track=track.id)
+        self._playing = True
+        self._paused = False
+        return track
+
+    async def pause(self):
+        await self.node.send(op='pause', guildId=str(self.guild.id), pause=True)
+        self._paused = True
+        return self._queue[0]
+
+    async def resume(self):
+        await self.node.send(op='pause', guildId=str(self.guild.id), pause=False)
+        self._paused = False
+        return self._queue[0]
+
+    async def skip(self, force=False):
+        if len(self._queue) <= 1 and not force:
+            raise IndexError('nothing to skip to')
+        old = self._queue.pop(0)
+        old.is_looping = False
+        if self._queue:
+            await self.play()
+        else:
+            await self.stop()
+        return old
+
+    async def stop(self):
+        self._queue.clear()
+        self._playing = False
+        await self.node.send(op='stop', guildId=str(self.guild.id))
+
+    async def toggle_song_loop(self):
+        track = self._queue[0]
+        track.is_looping = not track.is_looping
+        return track
+
+    async def remove_from_queue(self, index):
+        return self._queue.pop(index)
+
+    def current_queue(self):
+        return self._queue
+
+    def now_playing(self):
+        return self._queue[0] if self._queue else None
+
+
+class NodeMusic:
+    """Drop-in for DiscordUtils.Music when playback runs on audio nodes."""
+
+    def __init__(self):
+        self.players = []
+        self.queue = QueueMap()
+
+    def get_player(self, guild_id):
+        for player in self.players:
+            if player.guild.id == guild_id:
+                return player
+        return None
+
+    def create_player(self, ctx, **kwargs):
+        player = ctx.voice_client
+        player.music = self
+        self.players.append(player)
+        self.queue[ctx.guild.id] = player._queue
+        return player
+
+    def forget(self, player):
+        if player in self.players:
+            self.players.remove(player)
+        if self.queue.get(player.guild.id) is player._queue:
+            del self.queue[player.guild.id]
@@ -0,0 +1,78 @@
+"""CPU cost per stream-hour of the transcode and Opus passthrough paths.
+
+    python benchmarks/opus_passthrough.py song.webm
+
+The input should be an Opus-in-WebM file, like YouTube's itag 251. Both paths
+run as fast as possible, without -re, and the bot process plus FFmpeg CPU time
+is scaled to one hour of audio.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from discord.oggparse import OggStream
+from discord.opus import Encoder
+
+frame_bytes = Encoder.FRAME_SIZE
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def transcode(path):
+    # The old pipeline: FFmpeg decodes to PCM and the bot encodes every frame.
+    encoder = Encoder()
+    args = ['ffmpeg', '-loglevel', 'quiet', '-i', path, '-f', 's16le', '-ar', '48000', '-ac', '2', 'pipe:1']
+    process = subprocess.Popen(args, stdout=subprocess.PIPE)
+    frames = 0
+    while True:
+        pcm = process.stdout.read(frame_bytes)
+        if len(pcm) < frame_bytes:
+            break
+        encoder.encode(pcm, Encoder.SAMPLES_PER_FRAME)
+        frames += 1
+    process.wait()
+    return frames
+
+
+def passthrough(path):
+    # FFmpeg only remuxes WebM to Ogg; packets are sent as they are.
+    args = ['ffmpeg', '-loglevel', 'quiet', '-i', path, '-map_metadata', '-1', '-f', 'opus', '-c:a', 'copy', 'pipe:1']
+    process = subprocess.Popen(args, stdout=subprocess.PIPE)
+    frames = sum(1 for _ in OggStream(process.stdout).iter_packets())
+    process.wait()
+    return frames
+
+
+def run(name, func, path):
+    start_cpu, start_wall = cpu_seconds(), time.perf_counter()
+    frames = func(path)
+    cpu, wall = cpu_seconds() - start_cpu, time.perf_counter() - start_wall
+    audio = frames * Encoder.FRAME_LENGTH / 1000
+    if not audio:
+        print(f'{name:12} produced no audio')
+        return
+    print(f'{name:12} {audio:8.1f}s audio  {cpu:7.2f} CPU s  {wall:7.2f} wall s  {cpu / audio * 3600:8.1f} CPU s per stream-hour')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='Opus-in-WebM audio file or URL')
+    args = parser.parse_args()
+    if not discord.opus.is_loaded():
+        discord.opus._load_default()
+    run('transcode', transcode, args.path)
+    run('passthrough', passthrough, args.path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+from discord.ext import commands
+
+from cluster import ClusterLink
+from http_client import HTTPClient, PublicIP
+from guild_stats import StatsIndex
+from help import HelpCache
+from join_order import JoinIndex
+from members import MemberEvents, MemberLookup
+from menus import MenuRouter
+from metrics import Metrics
+
+
+class Nutcrack(commands.AutoShardedBot):
+
+    def __init__(self, *args, **kwargs):
+        # Bot.__init__ already registers the help command, so the cache has
+        # to exist before it runs.
+        self.help_cache = HelpCache()
+        super().__init__(*args, **kwargs)
+        self.menus = MenuRouter(self)
+        self.session = HTTPClient()
+        self.public_ip = PublicIP(self.session)
+        self.members = MemberLookup(self)
+        self.member_events = MemberEvents(self)
+        self.stats = StatsIndex(self)
+        self.join_order = JoinIndex(self)
+        self.cluster = ClusterLink(self)
+        self.metrics = Metrics(self)
+        self.metrics.add_cache("members", self.members.cache)
+        # Set by keep_alive() when the health server is enabled.
+        self.health = None
+
+    async def setup_hook(self):
+        await self.session.start()
+        await self.cluster.start()
+        self.metrics.start()
+
+    async def start(self, *args, **kwargs):
+        # discord.py 1.7 has no setup_hook, so run ours before connecting.
+        await self.setup_hook()
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        await super().close()
+        await self.cluster.close()
+        self.metrics.close()
+        if self.health is not None:
+            await self.health.close()
+        await self.session.close()
+
+    async def invoke(self, ctx):
+        await super().invoke(ctx)
+        if ctx.command is not None and ctx.command_failed:
+            self.metrics.commands_failed += 1
+
+    def add_command(self, command):
+        super().add_command(command)
+        self.help_cache.clear()
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self.help_cache.clear()
+        return command
+
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        self.help_cache.clear()
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        self.help_cache.clear()
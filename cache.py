@@ -0,0 +1,106 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """In-memory LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires, value = entry
+        if expires <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl, expires=None):
+        self._data[key] = (expires or time.time() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+
+class SQLiteCache:
+    """JSON values in a single SQLite table, so entries survive restarts."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+        self._db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        self._db.commit()
+
+    def get(self, key):
+        row = self._db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISSING, 0
+        value, expires = row
+        if expires <= time.time():
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._db.commit()
+            return MISSING, 0
+        return json.loads(value), expires
+
+    def set(self, key, value, ttl):
+        self._db.execute("REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", (key, json.dumps(value), time.time() + ttl))
+        self._db.commit()
+
+    def pop(self, key):
+        self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self._db.commit()
+
+    def items(self):
+        rows = self._db.execute("SELECT key, value FROM cache WHERE expires > ?", (time.time(),)).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def close(self):
+        self._db.close()
+
+
+class TieredCache:
+    """LRU in front of SQLite; disk hits are promoted back into memory."""
+
+    def __init__(self, path, maxsize=512):
+        self.memory = LRUCache(maxsize)
+        self.disk = SQLiteCache(path)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is MISSING:
+            value, expires = self.disk.get(key)
+            if value is MISSING:
+                self.misses += 1
+                return MISSING
+            self.memory.set(key, value, 0, expires=expires)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl):
+        self.memory.set(key, value, ttl)
+        self.disk.set(key, value, ttl)
+
+    def close(self):
+        self.disk.close()
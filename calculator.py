@@ -0,0 +1,140 @@
+import ast
+import asyncio
+import math
+import operator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Results up to inline_bits are computed on the event loop; anything bigger
+# goes to a worker process, and past max_bits the expression is refused.
+inline_bits = 4096
+max_bits = 1_000_000
+max_length = 2000
+timeout = 5
+
+operators = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+unary = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+_pool = None
+
+
+class CalcError(Exception):
+    pass
+
+
+class TooExpensive(CalcError):
+    pass
+
+
+def bits(value):
+    if isinstance(value, int):
+        return value.bit_length()
+    return 64
+
+
+def cost(op, left, right):
+    # Estimated size of the result in bits; only * and ** can blow up.
+    if isinstance(op, ast.Pow) and isinstance(left, int) and isinstance(right, int) and right > 0:
+        return bits(left) * right
+    if isinstance(op, ast.Mult):
+        return bits(left) + bits(right)
+    return max(bits(left), bits(right)) + 1
+
+
+def _eval(node, limit):
+    if isinstance(node, ast.Expression):
+        return _eval(node.body, limit)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in unary:
+        return unary[type(node.op)](_eval(node.operand, limit))
+    if isinstance(node, ast.BinOp) and type(node.op) in operators:
+        left = _eval(node.left, limit)
+        right = _eval(node.right, limit)
+        if cost(node.op, left, right) > limit:
+            raise TooExpensive()
+        try:
+            result = operators[type(node.op)](left, right)
+        except (ZeroDivisionError, OverflowError, TypeError, ValueError) as e:
+            raise CalcError(str(e))
+        if isinstance(result, complex):
+            # e.g. (-1)**0.5; % and // aren't defined on complex numbers.
+            raise CalcError("The result isn't a real number.")
+        return result
+    raise CalcError("Only numbers and + - * / // % ** are allowed.")
+
+
+def evaluate(expression, limit=inline_bits):
+    if len(expression) > max_length:
+        raise CalcError("That expression is too long.")
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+        return _eval(tree, limit)
+    except SyntaxError:
+        raise CalcError("That isn't a valid expression.")
+    except (RecursionError, MemoryError):
+        # Deeply nested input such as "1+1+...+1" or "----1" fits within
+        # max_length but is too deep for the parser or for _eval.
+        raise CalcError("That expression is nested too deeply.")
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=2)
+    return _pool
+
+
+def _kill_pool(pool):
+    global _pool
+    if _pool is pool:
+        _pool = None
+    # ProcessPoolExecutor can't cancel a running call, so stop the workers.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False)
+
+
+async def calculate(expression):
+    try:
+        return evaluate(expression)
+    except TooExpensive:
+        pass
+    loop = asyncio.get_event_loop()
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, evaluate, expression, max_bits), timeout)
+        except TooExpensive:
+            raise CalcError("That number is too big for me!")
+        except asyncio.TimeoutError:
+            _kill_pool(pool)
+            raise CalcError("That took too long to calculate.")
+        except BrokenProcessPool:
+            # Another expression timed out and took the shared pool down with
+            # this one still on it; run it again on a fresh pool.
+            _kill_pool(pool)
+    raise CalcError("That took too long to calculate.")
+
+
+def format_result(value, max_chars=1900):
+    """``value`` as text that fits in a Discord message (2000 characters)."""
+    if isinstance(value, int) and value.bit_length() > 13000:
+        # Python refuses to str() ints past ~4300 digits.
+        return f"a {int(value.bit_length() * math.log10(2)) + 1} digit number"
+    text = str(value)
+    if len(text) > max_chars:
+        digits = len(text.lstrip("-"))
+        return f"{text[:20]}…{text[-20:]} (a {digits} digit number)"
+    return text
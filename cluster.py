@@ -0,0 +1,272 @@
+import asyncio
+import os
+import signal
+import sys
+import time
+
+import discord
+
+from http_client import HTTPClient, loads, dumps
+
+# CLUSTERS=N splits the bot's shards across N processes on this machine. The
+# first process started becomes a supervisor: it works out the shard count
+# (SHARD_COUNT, or Discord's recommendation), starts one copy of the same
+# script per shard range and relays their stats over a local socket.
+# Without CLUSTERS the bot runs every shard in a single process.
+
+hub_host = "127.0.0.1"
+push_interval = 15
+# Exit status of a cluster that can't start no matter how often it's retried
+# (bad token, privileged intents not enabled); the supervisor stops on it.
+fatal_exit = 78
+
+
+def shard_kwargs():
+    """shard_ids/shard_count for this process, as set by the supervisor."""
+    shards = os.getenv("CLUSTER_SHARDS")
+    if shards is None:
+        count = os.getenv("SHARD_COUNT")
+        return {"shard_count": int(count)} if count else {}
+    return {
+        "shard_ids": [int(shard) for shard in shards.split(",")],
+        "shard_count": int(os.environ["SHARD_COUNT"]),
+    }
+
+
+def cluster_id():
+    value = os.getenv("CLUSTER_ID")
+    return int(value) if value is not None else None
+
+
+def split_shards(shard_count, clusters):
+    """Contiguous shard ranges, as even as possible, one per cluster."""
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return [shards for shards in ranges if shards]
+
+
+def supervising():
+    """Whether this process should supervise clusters rather than run a bot."""
+    return int(os.getenv("CLUSTERS", "1")) > 1 and cluster_id() is None
+
+
+def run(client, token):
+    """``client.run(token)``, or supervise a set of clusters when CLUSTERS > 1."""
+    if supervising():
+        Supervisor(token, int(os.environ["CLUSTERS"])).run()
+        return
+    try:
+        client.run(token)
+    except (discord.LoginFailure, discord.PrivilegedIntentsRequired) as e:
+        print(f"Can't start: {e}", file=sys.stderr)
+        sys.exit(fatal_exit)
+
+
+class Hub:
+    """Keeps the latest stats pushed by every cluster and answers queries for them."""
+
+    def __init__(self):
+        self.clusters = {}
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, hub_host, 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        try:
+            async for line in reader:
+                payload = loads(line)
+                if payload["op"] == "push":
+                    self.clusters[payload["cluster"]] = payload["stats"]
+                elif payload["op"] == "query":
+                    reply = {"nonce": payload["nonce"], "clusters": self.clusters}
+                    writer.write(dumps(reply).encode() + b"\n")
+                    await writer.drain()
+        except (ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+class Supervisor:
+    """Starts one process per shard range and restarts any that exit."""
+
+    def __init__(self, token, clusters, restart_delay=5, max_delay=300):
+        self.token = token
+        self.clusters = clusters
+        self.restart_delay = restart_delay
+        self.max_delay = max_delay
+        self.hub = Hub()
+        self.processes = {}
+        self.stopping = False
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+        try:
+            loop.run_until_complete(self.supervise())
+        finally:
+            loop.close()
+
+    async def shard_count(self):
+        count = os.getenv("SHARD_COUNT")
+        if count:
+            return int(count)
+        http = HTTPClient()
+        await http.start()
+        try:
+            data = await http.get_json(
+                "https://discord.com/api/v9/gateway/bot",
+                headers={"Authorization": f"Bot {self.token}"},
+            )
+        finally:
+            await http.close()
+        return data["shards"]
+
+    async def supervise(self):
+        shard_count = await self.shard_count()
+        port = await self.hub.start()
+        ranges = split_shards(shard_count, self.clusters)
+        print(f"Starting {len(ranges)} clusters for {shard_count} shards")
+        try:
+            await asyncio.gather(*(
+                self.keep_running(i, shards, shard_count, port) for i, shards in enumerate(ranges)
+            ))
+        finally:
+            self.hub.close()
+
+    async def keep_running(self, i, shards, shard_count, port):
+        env = dict(
+            os.environ,
+            CLUSTER_ID=str(i),
+            CLUSTER_SHARDS=",".join(map(str, shards)),
+            SHARD_COUNT=str(shard_count),
+            CLUSTER_HUB=f"{hub_host}:{port}",
+        )
+        delay = self.restart_delay
+        while not self.stopping:
+            started = time.monotonic()
+            process = self.processes[i] = await asyncio.create_subprocess_exec(sys.executable, *sys.argv, env=env)
+            code = await process.wait()
+            self.hub.clusters.pop(str(i), None)
+            if self.stopping:
+                break
+            if code == fatal_exit:
+                print(f"Cluster {i} can't start, stopping every cluster")
+                self.stop()
+                break
+            # Back off while a cluster keeps crashing soon after it starts.
+            if time.monotonic() - started > self.max_delay:
+                delay = self.restart_delay
+            print(f"Cluster {i} (shards {shards[0]}-{shards[-1]}) exited with {code}, restarting in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+    def stop(self):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.returncode is None:
+                process.terminate()
+
+
+class ClusterLink:
+    """This process's view of every cluster's guilds, users and shard latencies.
+
+    Without a supervisor (CLUSTER_HUB unset) only local stats are reported.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.id = cluster_id()
+        self.hub = os.getenv("CLUSTER_HUB")
+        self._reader = None
+        self._writer = None
+        self._task = None
+        self._pending = {}
+        self._nonce = 0
+
+    def local(self):
+        return {
+            "guilds": len(self.bot.guilds),
+            "users": sum(guild.member_count or 0 for guild in self.bot.guilds),
+            "latencies": {str(shard): latency for shard, latency in self.bot.latencies},
+        }
+
+    async def start(self):
+        if self.hub is None or self._task is not None:
+            return
+        host, port = self.hub.rsplit(":", 1)
+        self._reader, self._writer = await asyncio.open_connection(host, int(port))
+        self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _send(self, payload):
+        self._writer.write(dumps(payload).encode() + b"\n")
+        await self._writer.drain()
+
+    async def push(self):
+        await self._send({"op": "push", "cluster": str(self.id), "stats": self.local()})
+
+    async def _run(self):
+        listener = asyncio.ensure_future(self._listen())
+        try:
+            while True:
+                if self.bot.is_ready():
+                    await self.push()
+                await asyncio.sleep(push_interval)
+        finally:
+            listener.cancel()
+
+    async def _listen(self):
+        async for line in self._reader:
+            reply = loads(line)
+            future = self._pending.pop(reply["nonce"], None)
+            if future is not None and not future.done():
+                future.set_result(reply["clusters"])
+
+    async def stats(self, timeout=2):
+        """Totals across every cluster: guilds, users, clusters and per-shard latency."""
+        local = self.local()
+        clusters = {str(self.id): local}
+        if self._task is not None:
+            self._nonce += 1
+            future = self._pending[self._nonce] = asyncio.get_event_loop().create_future()
+            try:
+                await self.push()
+                await self._send({"op": "query", "nonce": self._nonce})
+                clusters = dict(await asyncio.wait_for(future, timeout))
+            except (asyncio.TimeoutError, ConnectionError):
+                self._pending.pop(self._nonce, None)
+            # Our own numbers are always fresher than what the hub holds.
+            clusters[str(self.id)] = local
+
+        latencies = {}
+        for stats in clusters.values():
+            latencies.update((int(shard), latency) for shard, latency in stats["latencies"].items())
+        return {
+            "clusters": len(clusters),
+            "guilds": sum(stats["guilds"] for stats in clusters.values()),
+            "users": sum(stats["users"] for stats in clusters.values()),
+            "latencies": dict(sorted(latencies.items())),
+        }
@@ -1,22 +1,41 @@
 import discord
 import animec
 import datetime
+import asyncio
 import random
 import aiohttp
 from io import BytesIO
 from discord.utils import get
 from discord.ext import commands
+from executor import GuildExecutor, ExecutorBusy
+from anilist import AniList, AniListError
 
 class Animec(commands.Cog):
 
   def __init__(self, client):
     self.client = client
+    self.scraper = GuildExecutor(workers=4, per_guild=2, timeout=20, name="animec")
+    self.anilist = AniList(client.session)
+    client.metrics.add_executor("animec", self.scraper)
+    client.metrics.add_cache("anilist", self.anilist.cache)
+
+  def cog_unload(self):
+    self.client.metrics.remove("animec")
+    self.client.metrics.remove("anilist")
+    self.scraper.shutdown()
+    self.anilist.close()
+
+  async def scrape(self, ctx, func, *args):
+    return await self.scraper.run(getattr(ctx.guild, 'id', None), func, *args)
 
   @commands.command()
   async def animec(self, ctx, *, search):
     async with ctx.typing():
       try:
-        anime = animec.Anime(search)
+        anime = await self.scrape(ctx, animec.Anime, search)
+      except (asyncio.TimeoutError, ExecutorBusy):
+        await ctx.reply(embed = discord.Embed(description = "Anime lookups are busy right now, try again in a bit.", color = discord.Color.red()))
+        return
       except:
         await ctx.reply(embed = discord.Embed(description = f"No Anime named '{search}' found.", color = discord.Color.red()))
         return
@@ -34,17 +53,23 @@ class Animec(commands.Cog):
   async def image(self, ctx, *, search):
     async with ctx.typing():
       try:
-        char = animec.Charsearch(search)
+        char = await self.scrape(ctx, animec.Charsearch, search)
         em = discord.Embed(title=char.title, url=char.url, color=0x5865F2)
         em.set_image(url=char.image_url)
         em.set_footer(text=", ".join(list(char.references.keys())[:2]))
         await ctx.reply(embed=em)
+      except (asyncio.TimeoutError, ExecutorBusy):
+        await ctx.reply(embed = discord.Embed(description = "Anime lookups are busy right now, try again in a bit.", color = discord.Color.red()))
       except:
         await ctx.reply(embed = discord.Embed(description = f"No Anime character named '{search}' found.", color = discord.Color.red()))
 
   @commands.command()
   async def aninews(self, ctx, amount:int=3):
-      news = animec.Aninews(amount)
+      try:
+        news = await self.scrape(ctx, animec.Aninews, amount)
+      except (asyncio.TimeoutError, ExecutorBusy):
+        await ctx.reply(embed = discord.Embed(description = "Anime lookups are busy right now, try again in a bit.", color = discord.Color.red()))
+        return
       links = news.links
       titles = news.titles
       descriptions = news.description
@@ -126,190 +151,97 @@ class Animec(commands.Cog):
 
   @commands.command(aliases=['anilist'])
   async def anime(self, ctx, *, animeName: str):
-        api = 'https://graphql.anilist.co'
-        query = '''
-        query ($name: String){
-          Media(search: $name, type: ANIME) {
-            id
-            idMal
-            description
-            title {
-              romaji
-              english
-            }
-            coverImage {
-              large
-            }
-            startDate {
-              year
-              month
-              day
-            }
-            endDate {
-              year
-              month
-              day
-            }
-            synonyms
-            format
-            status
-            episodes
-            duration
-            nextAiringEpisode {
-              episode
-            }
-            averageScore
-            meanScore
-            source
-            genres
-            tags {
-              name
-            }
-            studios(isMain: true) {
-              nodes {
-                name
-              }
-            }
-            siteUrl
-          }
-        }
-        '''
-        variables = {
-            'name': animeName
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api, json={'query': query, 'variables': variables}, headers = self.client.userAgentHeaders) as r:
-                if r.status == 200:
-                    json = await r.json()
-                    data = json['data']['Media']
-
-                    embed = discord.Embed(color=ctx.author.top_role.colour)
-                    embed.set_footer(text='API provided by AniList.co | ID: {}'.format(str(data['id'])))
-                    embed.set_thumbnail(url=data['coverImage']['large'])
-                    if data['title']['english'] == None or data['title']['english'] == data['title']['romaji']:
-                        embed.add_field(name='Titel', value=data['title']['romaji'], inline=False)
-                    else:
-                        embed.add_field(name='Titel', value='{} ({})'.format(data['title']['english'], data['title']['romaji']), inline=False)
-
-                    #embed.add_field(name='Beschreibung', value=data['description'], inline=False)
-                    if data['synonyms'] != []:
-                        embed.add_field(name='Synonyme', value=', '.join(data['synonyms']), inline=True)
-
-                    embed.add_field(name='Typ', value=data['format'].replace('_', ' ').title().replace('Tv', 'TV'), inline=True)
-                    if data['episodes'] > 1:
-                        embed.add_field(name='Folgen', value='{} à {} min'.format(data['episodes'], data['duration']), inline=True)
-                    else:
-                        embed.add_field(name='Dauer', value=str(data['duration']) + ' min', inline=True)
-
-                    embed.add_field(name='Gestartet', value='{}.{}.{}'.format(data['startDate']['day'], data['startDate']['month'], data['startDate']['year']), inline=True)
-                    if data['endDate']['day'] == None:
-                        embed.add_field(name='Released Folgen', value=data['nextAiringEpisode']['episode'] - 1, inline=True)
-                    elif data['episodes'] > 1:
-                        embed.add_field(name='Beendet', value='{}.{}.{}'.format(data['endDate']['day'], data['endDate']['month'], data['endDate']['year']), inline=True)
-
-                    embed.add_field(name='Status', value=data['status'].replace('_', ' ').title(), inline=True)
-
-                    try:
-                        embed.add_field(name='Haupt-Studio', value=data['studios']['nodes'][0]['name'], inline=True)
-                    except IndexError:
-                        pass
-                    embed.add_field(name='Ø Score', value=data['averageScore'], inline=True)
-                    embed.add_field(name='Genres', value=', '.join(data['genres']), inline=False)
-                    tags = ''
-                    for tag in data['tags']:
-                        tags += tag['name'] + ', '
-                    embed.add_field(name='Tags', value=tags[:-2], inline=False)
-                    try:
-                        embed.add_field(name='Adaptiert von', value=data['source'].replace('_', ' ').title(), inline=True)
-                    except AttributeError:
-                        pass
-
-                    embed.add_field(name='AniList Link', value=data['siteUrl'], inline=False)
-                    embed.add_field(name='MyAnimeList Link', value='https://myanimelist.net/anime/' + str(data['idMal']), inline=False)
-                    await ctx.send(embed=embed)
-
-                else:
-                    await ctx.send(':x: Konnte keinen passenden Anime finden!')
+        try:
+            data = await self.anilist.media(animeName, 'ANIME')
+        except AniListError:
+            await ctx.send(':x: AniList ist gerade nicht erreichbar!')
+            return
+        if data is None:
+            await ctx.send(':x: Konnte keinen passenden Anime finden!')
+            return
+
+        embed = discord.Embed(color=ctx.author.top_role.colour)
+        embed.set_footer(text='API provided by AniList.co | ID: {}'.format(str(data['id'])))
+        embed.set_thumbnail(url=data['coverImage']['large'])
+        if data['title']['english'] == None or data['title']['english'] == data['title']['romaji']:
+            embed.add_field(name='Titel', value=data['title']['romaji'], inline=False)
+        else:
+            embed.add_field(name='Titel', value='{} ({})'.format(data['title']['english'], data['title']['romaji']), inline=False)
+
+        #embed.add_field(name='Beschreibung', value=data['description'], inline=False)
+        if data['synonyms'] != []:
+            embed.add_field(name='Synonyme', value=', '.join(data['synonyms']), inline=True)
+
+        embed.add_field(name='Typ', value=data['format'].replace('_', ' ').title().replace('Tv', 'TV'), inline=True)
+        if data['episodes'] > 1:
+            embed.add_field(name='Folgen', value='{} à {} min'.format(data['episodes'], data['duration']), inline=True)
+        else:
+            embed.add_field(name='Dauer', value=str(data['duration']) + ' min', inline=True)
+
+        embed.add_field(name='Gestartet', value='{}.{}.{}'.format(data['startDate']['day'], data['startDate']['month'], data['startDate']['year']), inline=True)
+        if data['endDate']['day'] == None:
+            embed.add_field(name='Released Folgen', value=data['nextAiringEpisode']['episode'] - 1, inline=True)
+        elif data['episodes'] > 1:
+            embed.add_field(name='Beendet', value='{}.{}.{}'.format(data['endDate']['day'], data['endDate']['month'], data['endDate']['year']), inline=True)
+
+        embed.add_field(name='Status', value=data['status'].replace('_', ' ').title(), inline=True)
+
+        try:
+            embed.add_field(name='Haupt-Studio', value=data['studios']['nodes'][0]['name'], inline=True)
+        except IndexError:
+            pass
+        embed.add_field(name='Ø Score', value=data['averageScore'], inline=True)
+        embed.add_field(name='Genres', value=', '.join(data['genres']), inline=False)
+        tags = ''
+        for tag in data['tags']:
+            tags += tag['name'] + ', '
+        embed.add_field(name='Tags', value=tags[:-2], inline=False)
+        try:
+            embed.add_field(name='Adaptiert von', value=data['source'].replace('_', ' ').title(), inline=True)
+        except AttributeError:
+            pass
+
+        embed.add_field(name='AniList Link', value=data['siteUrl'], inline=False)
+        embed.add_field(name='MyAnimeList Link', value='https://myanimelist.net/anime/' + str(data['idMal']), inline=False)
+        await ctx.send(embed=embed)
 
   @commands.command()
   async def manga(self, ctx, *, mangaName: str):
-        api = 'https://graphql.anilist.co'
-        query = '''
-        query ($name: String){
-          Media(search: $name, type: MANGA) {
-            id
-            idMal
-            description
-            title {
-              romaji
-              english
-            }
-            coverImage {
-              large
-            }
-            startDate {
-              year
-              month
-              day
-            }
-            endDate {
-              year
-              month
-              day
-            }
-            status
-            chapters
-            volumes
-            averageScore
-            meanScore
-            genres
-            tags {
-              name
-            }
-            siteUrl
-          }
-        }
-        '''
-        variables = {
-            'name': mangaName
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api, json={'query': query, 'variables': variables}, headers = self.client.userAgentHeaders) as r:
-                if r.status == 200:
-                    json = await r.json()
-                    data = json['data']['Media']
-
-                    embed = discord.Embed(color=ctx.author.top_role.colour)
-                    embed.set_footer(text='API provided by AniList.co | ID: {}'.format(str(data['id'])))
-                    embed.set_thumbnail(url=data['coverImage']['large'])
-                    if data['title']['english'] == None or data['title']['english'] == data['title']['romaji']:
-                        embed.add_field(name='Titel', value=data['title']['romaji'], inline=False)
-                    else:
-                        embed.add_field(name='Titel', value='{} ({})'.format(data['title']['english'], data['title']['romaji']), inline=False)
-                    #embed.add_field(name='Beschreibung', value=data['description'], inline=False)
-                    if data['chapters'] != None:
-                        # https://github.com/AniList/ApiV2-GraphQL-Docs/issues/47
-                        embed.add_field(name='Kapitel', value=data['chapters'], inline=True)
-                    if data['volumes'] != None:
-                        embed.add_field(name='Bände', value=data['volumes'], inline=True)
-                    embed.add_field(name='Gestartet', value='{}.{}.{}'.format(data['startDate']['day'], data['startDate']['month'], data['startDate']['year']), inline=True)
-                    if data['endDate']['day'] != None:
-                        embed.add_field(name='Beendet', value='{}.{}.{}'.format(data['endDate']['day'], data['endDate']['month'], data['endDate']['year']), inline=True)
-                    embed.add_field(name='Status', value=data['status'].replace('_', ' ').title(), inline=True)
-                    embed.add_field(name='Ø Score', value=data['averageScore'], inline=True)
-                    embed.add_field(name='Genres', value=', '.join(data['genres']), inline=False)
-                    tags = ''
-                    for tag in data['tags']:
-                        tags += tag['name'] + ', '
-                    embed.add_field(name='Tags', value=tags[:-2], inline=False)
-                    embed.add_field(name='AniList Link', value=data['siteUrl'], inline=False)
-                    embed.add_field(name='MyAnimeList Link', value='https://myanimelist.net/anime/' + str(data['idMal']), inline=False)
-                    await ctx.send(embed=embed)
-
-                else:
-                    await ctx.send(':x: Konnte keinen passenden Manga finden!')
+        try:
+            data = await self.anilist.media(mangaName, 'MANGA')
+        except AniListError:
+            await ctx.send(':x: AniList ist gerade nicht erreichbar!')
+            return
+        if data is None:
+            await ctx.send(':x: Konnte keinen passenden Manga finden!')
+            return
+
+        embed = discord.Embed(color=ctx.author.top_role.colour)
+        embed.set_footer(text='API provided by AniList.co | ID: {}'.format(str(data['id'])))
+        embed.set_thumbnail(url=data['coverImage']['large'])
+        if data['title']['english'] == None or data['title']['english'] == data['title']['romaji']:
+            embed.add_field(name='Titel', value=data['title']['romaji'], inline=False)
+        else:
+            embed.add_field(name='Titel', value='{} ({})'.format(data['title']['english'], data['title']['romaji']), inline=False)
+        #embed.add_field(name='Beschreibung', value=data['description'], inline=False)
+        if data['chapters'] != None:
+            # https://github.com/AniList/ApiV2-GraphQL-Docs/issues/47
+            embed.add_field(name='Kapitel', value=data['chapters'], inline=True)
+        if data['volumes'] != None:
+            embed.add_field(name='Bände', value=data['volumes'], inline=True)
+        embed.add_field(name='Gestartet', value='{}.{}.{}'.format(data['startDate']['day'], data['startDate']['month'], data['startDate']['year']), inline=True)
+        if data['endDate']['day'] != None:
+            embed.add_field(name='Beendet', value='{}.{}.{}'.format(data['endDate']['day'], data['endDate']['month'], data['endDate']['year']), inline=True)
+        embed.add_field(name='Status', value=data['status'].replace('_', ' ').title(), inline=True)
+        embed.add_field(name='Ø Score', value=data['averageScore'], inline=True)
+        embed.add_field(name='Genres', value=', '.join(data['genres']), inline=False)
+        tags = ''
+        for tag in data['tags']:
+            tags += tag['name'] + ', '
+        embed.add_field(name='Tags', value=tags[:-2], inline=False)
+        embed.add_field(name='AniList Link', value=data['siteUrl'], inline=False)
+        embed.add_field(name='MyAnimeList Link', value='https://myanimelist.net/anime/' + str(data['idMal']), inline=False)
+        await ctx.send(embed=embed)
 
 def setup(client):
   client.add_cog(Animec(client))
\ No newline at end of file
@@ -2,13 +2,148 @@ import discord
 import datetime
 import DiscordUtils
 import asyncio
+import os
+import sys
+import time
 from discord.ext import commands
+from tracks import TrackResolver, TrackQueue, QueueMap, is_playlist, playlist_entries
+from audio_nodes import NodeMusic, NodePool, NodePlayer, NoAudioNode
+from opus import PassthroughDiscord
 
-music = DiscordUtils.Music()
+# AUDIO_NODES="host:port:password,..." moves playback out of this process and
+# onto Lavalink-style audio workers; without it DiscordUtils plays in-process.
+audio_nodes = os.getenv("AUDIO_NODES")
+
+if audio_nodes:
+    music = NodeMusic()
+    voice_cls = NodePlayer
+else:
+    music = DiscordUtils.Music()
+    voice_cls = discord.VoiceClient
+
+# Every guild's queue becomes a TrackQueue, even where DiscordUtils assigns a list.
+music.queue = QueueMap(music.queue)
+
+# DiscordUtils resolves every queued song through this module-level function,
+# so cache it there; repeated searches and playlist entries skip youtube_dl.
+music_module = sys.modules[DiscordUtils.Music.__module__]
+resolver = TrackResolver(music_module.get_video_data)
+music_module.get_video_data = resolver.get_video_data
+# Same idea for playback: let Opus sources skip the decode/re-encode step.
+music_module.discord = PassthroughDiscord()
+
+def check_queue_on_loop(ctx, opts, music, after, on_play, loop):
+    # DiscordUtils calls this from the audio player's thread when a song ends.
+    # Run its check_queue on the event loop instead, so a guild's TrackQueue is
+    # only ever changed from one thread and on_play is scheduled from the loop
+    # (check_queue uses loop.create_task, which isn't thread-safe).
+    loop.call_soon_threadsafe(music_module.check_queue, ctx, opts, music, after, on_play, loop)
+
+def guild_queue(guild_id):
+    return music.queue.get(guild_id) or TrackQueue()
+
+def drop_player(guild_id):
+    player = music.get_player(guild_id=guild_id)
+    if player is not None:
+        music.players.remove(player)
+    music.queue.pop(guild_id, None)
+
+class IdleTimer:
+    """One inactivity timer per guild; every music command pushes it back."""
+
+    def __init__(self, timeout, callback):
+        self.timeout = timeout
+        self.callback = callback
+        self._timers = {}
+
+    def __len__(self):
+        return len(self._timers)
+
+    def touch(self, ctx):
+        self.cancel(ctx.guild.id)
+        loop = asyncio.get_event_loop()
+        self._timers[ctx.guild.id] = loop.call_later(self.timeout, self._fire, ctx)
+
+    def cancel(self, guild_id):
+        timer = self._timers.pop(guild_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def cancel_all(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    def _fire(self, ctx):
+        self._timers.pop(ctx.guild.id, None)
+        asyncio.ensure_future(self.callback(ctx))
+
+class QueuePages:
+    """Builds one page of the queue embed at a time for the paginator."""
+
+    def __init__(self, guild, queue, per_page=10):
+        self.guild = guild
+        self.queue = queue
+        self.per_page = per_page
+
+    def __len__(self):
+        return max(1, -(-len(self.queue) // self.per_page))
+
+    def __getitem__(self, page):
+        start = page * self.per_page
+        songs = self.queue[start:start + self.per_page]
+        lines = [f'`{start + i}.` {song.name}' for i, song in enumerate(songs)]
+        if start == 0 and lines:
+            lines[0] = f'**Now playing:** {songs[0].name}'
+        embed=discord.Embed(title=f'Current Queue for {self.guild.name}', description='\n'.join(lines) or 'The queue is empty!', color=0x00FFFF)
+        embed.set_footer(text=f'Page {page + 1}/{len(self)} | {len(self.queue)} songs')
+        embed.timestamp = datetime.datetime.utcnow()
+        return embed
 
 class Music(commands.Cog):
     def __init__(self, client):
         self.client = client
+        self.idle = IdleTimer(300, self.idle_disconnect)
+        client.metrics.add_cache("tracks", resolver.cache)
+        if audio_nodes:
+            client.audio_nodes = NodePool.from_config(client.session, audio_nodes)
+            client.loop.create_task(self.connect_nodes())
+
+    def cog_unload(self):
+        self.client.metrics.remove("tracks")
+        self.idle.cancel_all()
+        if audio_nodes:
+            self.client.loop.create_task(self.client.audio_nodes.close())
+
+    async def connect_nodes(self):
+        await self.client.wait_until_ready()
+        self.client.audio_nodes.connect(self.client.user.id, self.client.shard_count or 1)
+
+    def refresh_next(self, player):
+        # The next song plays from the stream URL it was queued with; re-sign
+        # it now if it would expire before the current song finishes.
+        if audio_nodes:
+            return
+        queue = player.current_queue()
+        if len(queue) > 1:
+            resolver.refresh_soon(queue[1], self.client.loop, needed=queue[0].duration or 0)
+
+    async def on_song_play(self, ctx, song):
+        player = music.get_player(guild_id=ctx.guild.id)
+        if player is not None:
+            self.refresh_next(player)
+
+    async def idle_disconnect(self, ctx):
+        voice_client = ctx.guild.voice_client
+        if voice_client is None:
+            drop_player(ctx.guild.id)
+            return
+        if voice_client.is_playing():
+            self.idle.touch(ctx)
+            return
+        await voice_client.disconnect()
+        drop_player(ctx.guild.id)
+        await ctx.send("Left the VC due to inactivity!")
 
     @commands.command()
     async def leave(self, ctx):
@@ -21,7 +156,9 @@ class Music(commands.Cog):
             await ctx.send(f'{ctx.author.mention}, You are not in a VC!')
             return
         else:
+            self.idle.cancel(ctx.guild.id)
             await ctx.guild.voice_client.disconnect() 
+            drop_player(ctx.guild.id)
             await ctx.send("Left the VC!")
 
     @commands.command()
@@ -31,37 +168,83 @@ class Music(commands.Cog):
         if not invc:
             await ctx.send(f'{ctx.author.mention}, You are not in a VC!')
             return
-        if invc:
-            if not botinvc:
-                await ctx.author.voice.channel.connect()
-                player = music.get_player(guild_id=ctx.guild.id)
-                if not player:
-                    player =  music.create_player(ctx, ffmpeg_error_betterfix=True)
-                if not ctx.voice_client.is_playing():
-                    await player.queue(url, search=True)
-                    song = await player.play()
-                    await ctx.send(f'Now Playing: `{song.name}`')
-            
-            if botinvc:
-                player = music.get_player(guild_id=ctx.guild.id)
-                if not player:
-                    player =  music.create_player(ctx, ffmpeg_error_betterfix=True)
-                if not ctx.voice_client.is_playing():
-                    await player.queue(url, search=True)
-                    song = await player.play()
-                    await ctx.send(f'Now Playing: `{song.name}`')
-                else:
-                    song = await player.queue(url, search=True)
-                    embed=discord.Embed(title='Song Added to Queue!', description=f'**{song.name}** added!', color=0x00FFFF)
-                    embed.timestamp = datetime.datetime.utcnow()
-                    embed.set_footer(text=f'Added by {ctx.author}')
-                    await ctx.send(embed=embed)
-        await asyncio.sleep(300)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
+        if not botinvc:
+            try:
+                await ctx.author.voice.channel.connect(cls=voice_cls)
+            except NoAudioNode:
+                await ctx.send("Music is unavailable right now, try again in a bit!")
+                return
+        player = music.get_player(guild_id=ctx.guild.id)
+        if not player:
+            player =  music.create_player(ctx, ffmpeg_error_betterfix=True)
+            if not audio_nodes:
+                player.after_func = check_queue_on_loop
+                player.on_play(self.on_song_play)
+        if is_playlist(url):
+            await self.queue_playlist(ctx, player, url)
+        elif not ctx.voice_client.is_playing():
+            await player.queue(url, search=True)
+            song = await player.play()
+            await ctx.send(f'Now Playing: `{song.name}`')
         else:
-            pass
+            song = await player.queue(url, search=True)
+            embed=discord.Embed(title='Song Added to Queue!', description=f'**{song.name}** added!', color=0x00FFFF)
+            embed.timestamp = datetime.datetime.utcnow()
+            embed.set_footer(text=f'Added by {ctx.author}')
+            await ctx.send(embed=embed)
+        self.refresh_next(player)
+        self.idle.touch(ctx)
+
+    def still_playing(self, ctx, player):
+        # leave, stop and the idle timer drop the player while a playlist may
+        # still be queueing; stop queueing into it once that happens.
+        return player in music.players and ctx.voice_client is not None and ctx.voice_client.is_connected()
+
+    async def queue_playlist(self, ctx, player, url):
+        if audio_nodes:
+            # The audio node expands playlists itself in one request.
+            tracks = await player.load(url)
+            if not self.still_playing(ctx, player):
+                return
+            player.extend(tracks)
+            if not ctx.voice_client.is_playing():
+                song = await player.play()
+                await ctx.send(f'Now Playing: `{song.name}`')
+            await ctx.send(f'Queued {len(tracks)} songs!')
+            return
+        title, entries = await playlist_entries(url, self.client.loop)
+        if not self.still_playing(ctx, player):
+            return
+        if not entries:
+            await ctx.send(f"{ctx.author.mention}, I couldn't find any songs in that playlist!")
+            return
+        status = await ctx.send(f'Queueing **{title}**: 0/{len(entries)} songs...')
+        queued = failed = 0
+        last_edit = time.monotonic()
+        # Songs resolve concurrently but arrive in playlist order, so the
+        # first one can start playing while the rest are still resolving.
+        async for song in resolver.resolve_many(entries, self.client.loop, workers=4):
+            if not self.still_playing(ctx, player):
+                await status.edit(content=f'Stopped queueing **{title}** after {queued}/{len(entries)} songs.')
+                return
+            if song is None:
+                failed += 1
+                continue
+            # The song is already resolved; appending it directly (rather than
+            # through player.queue) leaves no await after the check above.
+            music.queue[ctx.guild.id].append(song)
+            queued += 1
+            if queued == 1 and not ctx.voice_client.is_playing():
+                song = await player.play()
+                await ctx.send(f'Now Playing: `{song.name}`')
+            if time.monotonic() - last_edit > 2:
+                last_edit = time.monotonic()
+                await status.edit(content=f'Queueing **{title}**: {queued + failed}/{len(entries)} songs...')
+            self.idle.touch(ctx)
+        summary = f'Queued {queued}/{len(entries)} songs from **{title}**!'
+        if failed:
+            summary += f' ({failed} unavailable)'
+        await status.edit(content=summary)
 
     @commands.command()
     async def pause(self, ctx):
@@ -76,12 +259,7 @@ class Music(commands.Cog):
         player = music.get_player(guild_id=ctx.guild.id)
         song = await player.pause()
         await ctx.send(f"Paused `{song.name}`!")
-        await asyncio.sleep(300)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        self.idle.touch(ctx)
 
     @commands.command()
     async def resume(self, ctx):
@@ -96,12 +274,7 @@ class Music(commands.Cog):
         player = music.get_player(guild_id=ctx.guild.id)
         song = await player.resume()
         await ctx.send(f"Resumed `{song.name}`!")
-        await asyncio.sleep(300)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        self.idle.touch(ctx)
 
     @commands.command()
     async def skip(self, ctx):
@@ -115,19 +288,14 @@ class Music(commands.Cog):
             return
         player = music.get_player(guild_id=ctx.guild.id)
         try:
+            song = player.current_queue()[1]
             await player.skip()
-            await asyncio.sleep(1)
-            song = player.now_playing()
             await ctx.send(f"Skipped! Now Playing `{song.name}`!")
+            self.refresh_next(player)
         except:
             await ctx.send(f"There is nothing in the queue!")
             return
-        await asyncio.sleep(300)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        self.idle.touch(ctx)
 
     @commands.command()
     async def stop(self, ctx):
@@ -142,12 +310,7 @@ class Music(commands.Cog):
         player = music.get_player(guild_id=ctx.guild.id)
         await player.stop()
         await ctx.send("Music Stopped!")
-        await asyncio.sleep(300)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        self.idle.touch(ctx)
 
     @commands.command()
     async def loop(self, ctx):
@@ -166,24 +329,14 @@ class Music(commands.Cog):
             await ctx.send(f"`{song.name}` is now looping!")
         else:
             await ctx.send(f"`{song.name}` is not looping anymore!")
-        await asyncio.sleep(300)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        self.idle.touch(ctx)
 
     @commands.command()
     async def remove(self, ctx, song):
         player = music.get_player(guild_id=ctx.guild.id)
         song = await player.remove_from_queue(int(song))
         await ctx.send(f"Removed `{song.name}`` from the queue.")
-        await asyncio.sleep(180)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        self.idle.touch(ctx)
 
     @commands.command()
     async def playing(self, ctx):
@@ -211,18 +364,40 @@ class Music(commands.Cog):
         if not invc:
             await ctx.send(f'{ctx.author.mention}, You are not in a VC!')
             return
-        nextline = " \n"
-        player = music.get_player(guild_id=ctx.guild.id)
-        queue = {nextline.join([song.name for song in player.current_queue()])}
-        embed=discord.Embed(title=f'Current Queue for {ctx.guild.name}', description=f'{queue}', color=0x00FFFF)
-        embed.timestamp = datetime.datetime.utcnow()
-        await ctx.send(embed=embed)
-        await asyncio.sleep(180)
-        if not ctx.voice_client.is_playing():
-            await ctx.guild.voice_client.disconnect() 
-            await ctx.send("Left the VC due to inactivity!")
-        else:
-            pass
+        await self.client.menus.paginate(ctx, QueuePages(ctx.guild, guild_queue(ctx.guild.id)), ctx.author)
+        self.idle.touch(ctx)
+
+    @commands.command()
+    async def shuffle(self, ctx):
+        if not ctx.guild.me.voice:
+            await ctx.send(f"{ctx.author.mention}, I'm not in a VC!")
+            return
+        guild_queue(ctx.guild.id).shuffle()
+        await ctx.send("Shuffled the queue!")
+        self.idle.touch(ctx)
+
+    @commands.command()
+    async def dedupe(self, ctx):
+        if not ctx.guild.me.voice:
+            await ctx.send(f"{ctx.author.mention}, I'm not in a VC!")
+            return
+        removed = guild_queue(ctx.guild.id).dedupe()
+        await ctx.send(f"Removed {removed} duplicate songs from the queue.")
+        self.idle.touch(ctx)
+
+    @commands.command()
+    async def move(self, ctx, source: int, destination: int):
+        if not ctx.guild.me.voice:
+            await ctx.send(f"{ctx.author.mention}, I'm not in a VC!")
+            return
+        queue = guild_queue(ctx.guild.id)
+        # Position 0 is the song that is playing.
+        if not (0 < source < len(queue) and 0 < destination < len(queue)):
+            await ctx.send(f"Pick positions between 1 and {len(queue) - 1}!")
+            return
+        song = queue.move(source, destination)
+        await ctx.send(f"Moved `{song.name}` to position {destination}.")
+        self.idle.touch(ctx)
 
 def setup(client):
   client.add_cog(Music(client))
\ No newline at end of file
@@ -0,0 +1,79 @@
+import time
+
+from discord.ext import commands
+from discord.ext.commands.view import StringView
+
+
+class Dispatcher:
+    """Pre-filters gateway messages so only prefixed ones ever build a Context."""
+
+    def __init__(self, bot, prefixes):
+        self.bot = bot
+        self.prefixes = {prefix.lower() for prefix in prefixes}
+        self.lengths = sorted({len(prefix) for prefix in self.prefixes}, reverse=True)
+        # Both cases of every prefix's first character, for a one-character
+        # reject before anything is sliced or lowercased.
+        self.first = {prefix[0] for prefix in self.prefixes} | {prefix[0].upper() for prefix in self.prefixes}
+        self.first.add("<")
+        self._mentions = None
+        self.seen = 0
+        self.processed = 0
+        self.dispatched = 0
+        self._sample = (time.monotonic(), 0, 0, 0)
+
+    @property
+    def mentions(self):
+        if self._mentions is None and self.bot.user is not None:
+            self._mentions = (f"<@{self.bot.user.id}>", f"<@!{self.bot.user.id}>")
+        return self._mentions or ()
+
+    def match_prefix(self, content):
+        for length in self.lengths:
+            prefix = content[:length]
+            if prefix.lower() in self.prefixes:
+                return prefix
+        return None
+
+    async def handle(self, message):
+        self.seen += 1
+        content = message.content
+        if message.author.bot or not content or content[0] not in self.first:
+            return
+        self.processed += 1
+
+        if content[0] == "<":
+            if content in self.mentions:
+                ctx = await self.bot.get_context(message)
+                await ctx.send_help()
+            return
+
+        prefix = self.match_prefix(content)
+        if prefix is None:
+            return
+
+        view = StringView(content)
+        view.skip_string(prefix)
+        invoker = view.get_word()
+        # all_commands is kept up to date by add/remove_command, so it doubles
+        # as the name and alias lookup table.
+        command = self.bot.all_commands.get(invoker)
+        if command is None:
+            return
+
+        ctx = commands.Context(prefix=prefix, view=view, bot=self.bot, message=message)
+        ctx.invoked_with = invoker
+        ctx.command = command
+        self.dispatched += 1
+        await self.bot.invoke(ctx)
+
+    def rates(self):
+        """Messages per second seen, processed and dispatched since the last call."""
+        now = time.monotonic()
+        then, seen, processed, dispatched = self._sample
+        self._sample = (now, self.seen, self.processed, self.dispatched)
+        elapsed = max(now - then, 1e-9)
+        return (
+            (self.seen - seen) / elapsed,
+            (self.processed - processed) / elapsed,
+            (self.dispatched - dispatched) / elapsed,
+        )
@@ -0,0 +1,62 @@
+import asyncio
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class GuildExecutor:
+    """Runs blocking calls in a small thread pool, capped per guild."""
+
+    def __init__(self, *, workers=4, per_guild=2, timeout=20, max_queue=32, name="executor"):
+        self.per_guild = per_guild
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._guilds = defaultdict(lambda: asyncio.Semaphore(self.per_guild))
+        self._waiting = defaultdict(int)
+        self.queue_depth = 0
+        self.completed = 0
+        self.timed_out = 0
+
+    async def run(self, guild_id, func, *args, **kwargs):
+        if self.queue_depth >= self.max_queue:
+            raise ExecutorBusy()
+        self.queue_depth += 1
+        self._waiting[guild_id] += 1
+        loop = asyncio.get_event_loop()
+        try:
+            await self._guilds[guild_id].acquire()
+        except BaseException:
+            self._release(guild_id, acquired=False)
+            raise
+        try:
+            future = self._pool.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release(guild_id)
+            raise
+        # A timed-out call keeps its worker thread busy, so the guild's slot
+        # and the queue depth are only given back once the thread is done.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, guild_id))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        self.completed += 1
+        return result
+
+    def _release(self, guild_id, acquired=True):
+        if acquired:
+            self._guilds[guild_id].release()
+        self.queue_depth -= 1
+        self._waiting[guild_id] -= 1
+        if not self._waiting[guild_id]:
+            del self._waiting[guild_id]
+            self._guilds.pop(guild_id, None)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
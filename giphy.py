@@ -0,0 +1,85 @@
+import asyncio
+import random
+from collections import OrderedDict
+
+api = 'https://api.giphy.com/v1/gifs/'
+
+
+class GifPool:
+
+    def __init__(self):
+        self.urls = []
+        self.offset = 0
+        self.task = None
+
+
+class Giphy:
+    """Keeps a pool of prefetched GIF URLs per search term.
+
+    Each call pops a random URL from memory; the pool is topped up in the
+    background once it drops to ``low`` entries. The empty search term pools
+    trending GIFs.
+    """
+
+    def __init__(self, http, key, *, size=50, low=10, max_pools=128):
+        self.http = http
+        self.key = key
+        self.size = size
+        self.low = low
+        self.max_pools = max_pools
+        self.hits = 0
+        self.misses = 0
+        self._pools = OrderedDict()
+
+    async def random(self, query=''):
+        term = ' '.join(query.casefold().split())
+        pool = self._pools.get(term)
+        if pool is None:
+            pool = self._pools[term] = GifPool()
+            while len(self._pools) > self.max_pools:
+                # A refill still in flight may have a caller waiting on it;
+                # it finishes into the evicted pool, which is then dropped.
+                self._pools.popitem(last=False)
+        else:
+            self._pools.move_to_end(term)
+
+        if not pool.urls:
+            self.misses += 1
+            await asyncio.shield(self._refill(term, pool))
+            if not pool.urls:
+                raise LookupError(query)
+        else:
+            self.hits += 1
+            if len(pool.urls) <= self.low:
+                self._refill(term, pool).add_done_callback(_consume)
+
+        urls = pool.urls
+        i = random.randrange(len(urls))
+        urls[i], urls[-1] = urls[-1], urls[i]
+        return urls.pop()
+
+    def _refill(self, term, pool):
+        if pool.task is None or pool.task.done():
+            pool.task = asyncio.ensure_future(self._fetch(term, pool))
+        return pool.task
+
+    async def _fetch(self, term, pool):
+        params = {'api_key': self.key, 'limit': self.size, 'offset': pool.offset}
+        if term:
+            params['q'] = term
+            data = await self.http.get_json(api + 'search', params=params)
+        else:
+            data = await self.http.get_json(api + 'trending', params=params)
+        urls = [gif['images']['original']['url'] for gif in data['data']]
+        total = data.get('pagination', {}).get('total_count', 0)
+        # Walk further into the results on every refill so the pool doesn't
+        # keep serving the same 50 GIFs, and wrap before Giphy's offset cap.
+        pool.offset += len(urls)
+        if not urls or pool.offset >= min(total, 4999):
+            pool.offset = 0
+        pool.urls.extend(urls)
+
+
+def _consume(task):
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,131 @@
+
+class GuildStats:
+    """Member counts for one guild: bots, humans and members per role.
+
+    Members are kept as compact ``(bot, role ids, name)`` records rather than
+    Member objects, so the index doesn't depend on the member cache.
+    """
+
+    def __init__(self, guild, members, sample_size):
+        self.sample_size = sample_size
+        self.default_role = guild.id
+        self.bots = set()
+        self.humans = 0
+        self.role_counts = {}
+        # role id -> {member id: name}, at most sample_size names per role
+        self.role_samples = {}
+        self._members = {}
+        for member in members:
+            self.add(member.id, member.bot, [role.id for role in member.roles], member.name)
+
+    def add(self, member_id, bot, role_ids, name):
+        if member_id in self._members:
+            self.remove(member_id)
+        role_ids = tuple(role_id for role_id in role_ids if role_id != self.default_role)
+        self._members[member_id] = (bot, role_ids, name)
+        if bot:
+            self.bots.add(member_id)
+        else:
+            self.humans += 1
+        for role_id in role_ids:
+            self.role_counts[role_id] = self.role_counts.get(role_id, 0) + 1
+            sample = self.role_samples.setdefault(role_id, {})
+            if len(sample) < self.sample_size:
+                sample[member_id] = name
+
+    def remove(self, member_id):
+        record = self._members.pop(member_id, None)
+        if record is None:
+            return
+        bot, role_ids, _ = record
+        if bot:
+            self.bots.discard(member_id)
+        else:
+            self.humans -= 1
+        for role_id in role_ids:
+            count = self.role_counts.get(role_id, 0) - 1
+            if count > 0:
+                self.role_counts[role_id] = count
+                self.role_samples.get(role_id, {}).pop(member_id, None)
+            else:
+                self.role_counts.pop(role_id, None)
+                self.role_samples.pop(role_id, None)
+
+    def remove_role(self, role_id):
+        self.role_counts.pop(role_id, None)
+        self.role_samples.pop(role_id, None)
+
+    def members(self, role_id):
+        return self.role_counts.get(role_id, 0)
+
+    def sample(self, role_id):
+        sample = self.role_samples.get(role_id)
+        if sample is None:
+            return []
+        if len(sample) < min(self.sample_size, self.members(role_id)):
+            # Members who left took their place in the sample with them;
+            # top it back up from the other members that have the role.
+            for member_id, (_, role_ids, name) in self._members.items():
+                if role_id in role_ids and member_id not in sample:
+                    sample[member_id] = name
+                    if len(sample) >= self.sample_size:
+                        break
+        return list(sample.values())
+
+
+class StatsIndex:
+    """Per-guild GuildStats, built on first use and kept current from gateway events.
+
+    Member changes are read from the raw GUILD_MEMBER_* payloads (see
+    MemberEvents): with the lean cache profile discord.py only dispatches
+    member_update and member_remove for cached members.
+    """
+
+    def __init__(self, bot, sample_size=10):
+        self.bot = bot
+        self.sample_size = sample_size
+        self._guilds = {}
+        # guild id -> member events received while its chunk is in flight
+        self._building = {}
+        bot.member_events.subscribe(self.on_member_event)
+        bot.add_listener(self.on_guild_role_delete, 'on_guild_role_delete')
+        bot.add_listener(self.on_guild_remove, 'on_guild_remove')
+
+    async def get(self, guild):
+        stats = self._guilds.get(guild.id)
+        if stats is None:
+            pending = self._building.setdefault(guild.id, [])
+            try:
+                members = await self.bot.members.chunk(guild)
+            finally:
+                self._building.pop(guild.id, None)
+            stats = self._guilds.get(guild.id)
+            if stats is None:
+                stats = self._guilds[guild.id] = GuildStats(guild, members, self.sample_size)
+                # Member events that arrived during the chunk may be missing from it.
+                for event, data in pending:
+                    self._apply(stats, event, data)
+        return stats
+
+    def on_member_event(self, event, data):
+        guild_id = int(data['guild_id'])
+        stats = self._guilds.get(guild_id)
+        if stats is not None:
+            self._apply(stats, event, data)
+        elif guild_id in self._building:
+            self._building[guild_id].append((event, data))
+
+    def _apply(self, stats, event, data):
+        user = data['user']
+        if event == 'GUILD_MEMBER_REMOVE':
+            stats.remove(int(user['id']))
+        else:
+            stats.add(int(user['id']), user.get('bot', False), [int(role_id) for role_id in data['roles']], user['username'])
+
+    async def on_guild_role_delete(self, role):
+        stats = self._guilds.get(role.guild.id)
+        if stats is not None:
+            stats.remove_role(role.id)
+
+    async def on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
@@ -0,0 +1,99 @@
+import datetime
+
+import discord
+from discord.ext import commands
+
+fields_per_page = 20
+
+
+class HelpCache:
+    """Rendered help pages, dropped whenever a command or cog changes."""
+
+    def __init__(self):
+        self.pages = None
+        self.cogs = {}
+        self.commands = {}
+
+    def clear(self):
+        self.pages = None
+        self.cogs.clear()
+        self.commands.clear()
+
+
+class NutcrackHelp(commands.HelpCommand):
+    # discord.py deep-copies the help command for every invocation, so the
+    # rendered pages live on the bot (bot.help_cache) rather than on self.
+
+    def __init__(self, *, prefix="n!", **options):
+        self.prefix = prefix
+        super().__init__(**options)
+
+    @property
+    def cache(self):
+        return self.context.bot.help_cache
+
+    def field(self, command):
+        description = command.description or command.help or 'No description was provided'
+        usage = " ".join(filter(None, [self.prefix + command.qualified_name, command.signature]))
+        return f"`{usage}`", description
+
+    def render(self):
+        bot = self.context.bot
+        mapping = {}
+        for command in bot.walk_commands():
+            if not command.hidden:
+                mapping.setdefault(command.cog_name or "General", []).append(command)
+
+        pages = []
+        for cog_name in sorted(mapping, key=lambda name: (name != "General", name)):
+            cog_commands = sorted(mapping[cog_name], key=lambda c: c.qualified_name)
+            cog_pages = []
+            for start in range(0, len(cog_commands), fields_per_page):
+                em = discord.Embed(title="Help!", description=f"Help command for {bot.user.name}!\n**{cog_name}**", color=0x5865F2)
+                for command in cog_commands[start:start + fields_per_page]:
+                    name, value = self.field(command)
+                    em.add_field(name=name, value=value)
+                cog_pages.append(em)
+            self.cache.cogs[cog_name] = cog_pages
+            pages.extend(cog_pages)
+
+        for i, em in enumerate(pages, 1):
+            em.set_footer(text=f"Total commands [{len(bot.commands)}] | Page {i}/{len(pages)}")
+        self.cache.pages = pages
+
+    def pages(self, cog_name=None):
+        if self.cache.pages is None:
+            self.render()
+        if cog_name is None:
+            return self.cache.pages
+        return self.cache.cogs.get(cog_name, [])
+
+    async def send_pages(self, pages):
+        destination = self.get_destination()
+        if not pages:
+            return await destination.send("No commands to show!")
+        # The cached embeds are shared by every invocation, so stamp copies.
+        now = datetime.datetime.utcnow()
+        pages = [discord.Embed.from_dict(em.to_dict()) for em in pages]
+        for em in pages:
+            em.timestamp = now
+        await self.context.bot.menus.paginate(destination, pages, self.context.author)
+
+    async def send_bot_help(self, mapping):
+        await self.send_pages(self.pages())
+
+    async def send_cog_help(self, cog):
+        await self.send_pages(self.pages(cog.qualified_name))
+
+    async def send_command_help(self, command):
+        em = self.cache.commands.get(command.qualified_name)
+        if em is None:
+            name, value = self.field(command)
+            em = discord.Embed(title=name, description=value, color=0x5865F2)
+            if command.aliases:
+                em.add_field(name="Aliases", value=", ".join(command.aliases))
+            self.cache.commands[command.qualified_name] = em
+        await self.get_destination().send(embed=em)
+
+    send_group_help = send_command_help
+
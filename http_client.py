@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+else:
+    loads = json.loads
+    dumps = json.dumps
+
+USER_AGENT = "Nutcrack (discord.py bot)"
+
+
+class HTTPClient:
+    """One pooled aiohttp session shared by every command and cog."""
+
+    def __init__(self, *, limit=100, limit_per_host=10, dns_ttl=300, keepalive=30, timeout=15):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self._session = None
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=self.keepalive,
+            enable_cleanup_closed=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": USER_AGENT},
+            json_serialize=dumps,
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTPClient.start() has not been called")
+        return self._session
+
+    async def request_json(self, method, url, *, check=True, **kwargs):
+        async with self.session.request(method, url, **kwargs) as r:
+            if check:
+                r.raise_for_status()
+            return loads(await r.read())
+
+    async def get_json(self, url, **kwargs):
+        return await self.request_json("GET", url, **kwargs)
+
+    async def post_json(self, url, **kwargs):
+        return await self.request_json("POST", url, **kwargs)
+
+    async def get_text(self, url, **kwargs):
+        async with self.session.get(url, **kwargs) as r:
+            r.raise_for_status()
+            return await r.text()
+
+
+class PublicIP:
+    """The bot's public IP, re-fetched at most once per ``refresh`` seconds."""
+
+    url = "https://api.ipify.org"
+
+    def __init__(self, http, *, refresh=3600):
+        self.http = http
+        self.refresh = refresh
+        self._ip = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        async with self._lock:
+            if self._ip is None or time.monotonic() - self._fetched_at >= self.refresh:
+                self._ip = (await self.http.get_text(self.url)).strip()
+                self._fetched_at = time.monotonic()
+            return self._ip
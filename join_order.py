@@ -0,0 +1,109 @@
+from bisect import bisect_left, insort
+
+from discord.utils import parse_time
+
+
+class JoinOrder:
+    """Members of one guild sorted by ``joined_at``, searched with bisect."""
+
+    def __init__(self, members=()):
+        # member id -> sort key, so a leave (which carries no join date) can
+        # still find its entry.
+        self._keys = {member.id: self.key(member.joined_at, member.id) for member in members if member.joined_at}
+        self._entries = sorted(self._keys.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(joined_at, member_id):
+        # Sorted on the naive UTC datetime itself; .timestamp() would read it
+        # as local time. The member ID breaks ties between identical joins.
+        return (joined_at, member_id)
+
+    def add(self, member_id, joined_at):
+        if not joined_at or member_id in self._keys:
+            return
+        key = self._keys[member_id] = self.key(joined_at, member_id)
+        insort(self._entries, key)
+
+    def remove(self, member_id):
+        key = self._keys.pop(member_id, None)
+        if key is None:
+            return
+        i = bisect_left(self._entries, key)
+        if i < len(self._entries) and self._entries[i] == key:
+            del self._entries[i]
+
+    def position(self, member):
+        """1-based join position, or None if the member isn't indexed."""
+        key = self._keys.get(member.id)
+        if key is None:
+            return None
+        i = bisect_left(self._entries, key)
+        if i < len(self._entries) and self._entries[i] == key:
+            return i + 1
+        return None
+
+    def around(self, member, count=2):
+        """IDs of up to ``count`` members who joined just before and after ``member``."""
+        position = self.position(member)
+        if position is None:
+            return [], []
+        i = position - 1
+        before = [member_id for _, member_id in self._entries[max(0, i - count):i]]
+        after = [member_id for _, member_id in self._entries[i + 1:i + 1 + count]]
+        return before, after
+
+
+class JoinIndex:
+    """Per-guild JoinOrder, built on first use and kept current from join/leave events.
+
+    Joins and leaves are read from the raw gateway payloads (see
+    MemberEvents), since discord.py only dispatches member_remove for members
+    it has cached.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._guilds = {}
+        # guild id -> joins and leaves received while its chunk is in flight
+        self._building = {}
+        bot.member_events.subscribe(self.on_member_event)
+        bot.add_listener(self.on_guild_remove, 'on_guild_remove')
+
+    async def get(self, guild):
+        order = self._guilds.get(guild.id)
+        if order is None:
+            pending = self._building.setdefault(guild.id, [])
+            try:
+                members = await self.bot.members.chunk(guild)
+            finally:
+                self._building.pop(guild.id, None)
+            order = self._guilds.get(guild.id)
+            if order is None:
+                order = self._guilds[guild.id] = JoinOrder(members)
+                # Joins and leaves during the chunk may be missing from it.
+                for event, data in pending:
+                    self._apply(order, event, data)
+        return order
+
+    def on_member_event(self, event, data):
+        if event not in ('GUILD_MEMBER_ADD', 'GUILD_MEMBER_REMOVE'):
+            return
+        guild_id = int(data['guild_id'])
+        order = self._guilds.get(guild_id)
+        if order is not None:
+            self._apply(order, event, data)
+        elif guild_id in self._building:
+            self._building[guild_id].append((event, data))
+
+    def _apply(self, order, event, data):
+        member_id = int(data['user']['id'])
+        if event == 'GUILD_MEMBER_ADD':
+            order.add(member_id, parse_time(data.get('joined_at')))
+        else:
+            order.remove(member_id)
+
+    async def on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
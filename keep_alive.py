@@ -1,15 +1,68 @@
-from flask import Flask
-from threading import Thread
+import os
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def home():
-    return "</> :\nonline"
+import cluster
 
-def run():
-  app.run(host='0.0.0.0',port=8080)
 
-def keep_alive():  
-    t = Thread(target=run)
-    t.start()
\ No newline at end of file
+class HealthServer:
+    """Health checks and metrics served from the bot's own event loop.
+
+    ``/healthz`` fails once the loop has been blocked for ``max_lag`` seconds,
+    ``/readyz`` until every shard is connected, and ``/metrics`` is for
+    Prometheus.
+    """
+
+    def __init__(self, bot, host='0.0.0.0', port=8080, max_lag=10):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.max_lag = max_lag
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get('/', self.home),
+            web.get('/healthz', self.healthz),
+            web.get('/readyz', self.readyz),
+            web.get('/metrics', self.metrics),
+        ])
+        self._runner = None
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def ready(self):
+        bot = self.bot
+        return bot.is_ready() and not bot.is_closed() and all(not shard.is_closed() for shard in bot.shards.values())
+
+    async def home(self, request):
+        return web.Response(text="</> :\nonline")
+
+    async def healthz(self, request):
+        if self.bot.metrics.loop_lag > self.max_lag:
+            return web.Response(status=503, text=f"event loop lagging {self.bot.metrics.loop_lag:.1f}s")
+        return web.Response(text="ok")
+
+    async def readyz(self, request):
+        if not self.ready():
+            return web.Response(status=503, text="not ready")
+        return web.Response(text="ready")
+
+    async def metrics(self, request):
+        return web.Response(text=self.bot.metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+def keep_alive(client):
+    # A cluster supervisor has no bot to report on; each cluster serves on
+    # PORT plus its cluster id instead.
+    if cluster.supervising():
+        return
+    port = int(os.getenv("PORT", 8080)) + (cluster.cluster_id() or 0)
+    client.health = HealthServer(client, port=port)
+    client.loop.create_task(client.health.start())
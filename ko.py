@@ -1,48 +1,95 @@
+import typing
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import os
 import datetime
 from discord_components import *
 from PIL import Image
 from io import BytesIO
+import calculator as calc_engine
+from calculator import CalcError, format_result
+from cache import SQLiteCache
+from triggers import TriggerEngine
+from snipes import SnipeStore
 
 client = commands.Bot(command_prefix="op!", help_command=None)
 bot = commands.Bot(command_prefix="op!")
-client.sniped_messages = {}
+snipes = SnipeStore()
+
+
+triggers = TriggerEngine({
+    'lol': "<:laugh:913301237217259561>",
+    'hi': "👋",
+    'hello': "👋",
+    'bruh': "<:hidethepainharold:904620202686308382>",
+}, store=SQLiteCache('triggers.sqlite3'))
 
 
 @client.event
-async def on_message(message): 
-    msg = message.content.lower() 
-    if msg.startswith('lol'):
-        await message.add_reaction("<:laugh:913301237217259561>")
-    if msg.startswith('hi'):
-        await message.add_reaction("👋")
-    if msg.startswith('hello'):
-        await message.add_reaction("👋")
-    if msg.startswith('bruh'):
-        await message.add_reaction("<:hidethepainharold:904620202686308382>")
+async def on_message(message):
+    if message.author.bot:
+        return
+    guild_id = message.guild.id if message.guild else None
+    for reaction in triggers.match(guild_id, message.content):
+        try:
+            await message.add_reaction(reaction)
+        except discord.HTTPException:
+            # Missing permissions or an emoji that's gone mustn't stop commands.
+            pass
     await client.process_commands(message)
 
+@client.group(invoke_without_command=True)
+@commands.guild_only()
+async def trigger(ctx):
+    words = triggers.trie(ctx.guild.id).words
+    lines = [f"`{word}` → {reaction}" for word, reaction in sorted(words.items())]
+    await ctx.send("\n".join(lines) or "No triggers set!")
+
+@trigger.command(name="add")
+@commands.has_permissions(manage_guild=True)
+async def trigger_add(ctx, word, reaction):
+    try:
+        await ctx.message.add_reaction(reaction)
+    except discord.HTTPException:
+        await ctx.send(f"I can't react with {reaction} here!")
+        return
+    triggers.add(ctx.guild.id, word, reaction)
+    await ctx.send(f"Reacting to messages starting with `{word.lower()}` with {reaction}")
+
+@trigger.command(name="remove")
+@commands.has_permissions(manage_guild=True)
+async def trigger_remove(ctx, word):
+    if triggers.remove(ctx.guild.id, word):
+        await ctx.send(f"Removed the `{word.lower()}` trigger")
+    else:
+        await ctx.send(f"There is no `{word.lower()}` trigger")
+
 @client.event
 async def on_message_delete(message):
-    client.sniped_messages[message.guild.id] = (message.content, message.author, message.channel.name, message.created_at)
+    snipes.add(message)
 
 @client.command()
-async def snipe(ctx):
-    try:
-        contents, author, channel_name, time = client.sniped_messages[ctx.guild.id]
-        
-    except:
+async def snipe(ctx, index: typing.Optional[int] = 1, channel: discord.TextChannel = None):
+    channel = channel or ctx.channel
+    record = snipes.get(ctx.guild.id, channel.id, index)
+    if record is None:
         await ctx.channel.send("Couldn't find a message to snipe!")
         return
 
-    embed = discord.Embed(description=contents, color=discord.Color.orange(), timestamp=time)
+    author = client.get_user(record.author_id) or await client.fetch_user(record.author_id)
+    time = datetime.datetime.utcfromtimestamp(record.created_at)
+    embed = discord.Embed(description=record.content, color=discord.Color.orange(), timestamp=time)
     embed.set_author(name=f"{author.name}#{author.discriminator}", icon_url=author.avatar_url)
-    embed.set_footer(text=f"Deleted in : #{channel_name}")
+    embed.set_footer(text=f"Deleted in : #{channel.name} • {index}/{snipes.count(ctx.guild.id, channel.id)}")
 
     await ctx.channel.send(embed=embed)
 
+@tasks.loop(minutes=10)
+async def expire_snipes():
+    snipes.sweep()
+
+expire_snipes.start()
+
 buttons = [
     [
         Button(style=ButtonStyle.grey, label='1'),
@@ -75,42 +122,69 @@ buttons = [
 ]
  
 
-def calculate(exp):
+async def calculate(exp):
     o = exp.replace('×', '*')
     o = o.replace('÷', '/')
-    result = ''
     try:
-        result = str(eval(o))
-    except:
+        result = format_result(await calc_engine.calculate(o))
+    except CalcError:
         result = 'An error occurred.'
     return result
  
+class CalcSession:
+
+    def __init__(self, owner, expires):
+        self.owner_id = owner.id
+        self.owner_name = owner.name
+        self.expires = expires
+        self.expression = ''
+
+    def embed(self):
+        return discord.Embed(title=f'{self.owner_name}\'s calculator', description=self.expression or 'None',
+                            timestamp=self.expires)
+
+# Open calculators by message id, so a click goes straight to its session.
+calc_sessions = {}
+
 @client.command()
 async def calc(ctx):
     m = await ctx.send(content='Loading Calculators...')
-    expression = 'None'
     delta = datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
-    e = discord.Embed(title=f'{ctx.author.name}\'s calculator | {ctx.author.id}', description=expression,
-                        timestamp=delta)
-    await m.edit(components=buttons, embed=e)
-    while m.created_at < delta:
-        res = await client.wait_for('button_click')
-        if res.author.id == int(res.message.embeds[0].title.split('|')[1]) and res.message.embeds[
-            0].timestamp < delta:
-            expression = res.message.embeds[0].description
-            if expression == 'None' or expression == 'An error occurred.':
-                expression = ''
-            if res.component.label == 'Exit':
-                await res.respond(content='Calculator Closed', type=7)
-                break
-            elif res.component.label == '←':
-                expression = expression[:-1]
-            elif res.component.label == 'Clear':
-                expression = 'None'
-            elif res.component.label == '=':
-                expression = calculate(expression)
-            else:
-                expression += res.component.label
-            f = discord.Embed(title=f'{res.author.name}\'s calculator|{res.author.id}', description=expression,
-                                timestamp=delta)
-            await res.respond(content='', embed=f, components=buttons, type=7)
\ No newline at end of file
+    session = calc_sessions[m.id] = CalcSession(ctx.author, delta)
+    await m.edit(components=buttons, embed=session.embed())
+
+@client.event
+async def on_button_click(res):
+    session = calc_sessions.get(res.message.id)
+    # Every click needs a response, or Discord shows "This interaction failed".
+    if session is None or session.expires < datetime.datetime.utcnow():
+        calc_sessions.pop(res.message.id, None)
+        await res.respond(content='This calculator has expired, open a new one with op!calc', type=4, ephemeral=True)
+        return
+    if res.author.id != session.owner_id:
+        await res.respond(content="This isn't your calculator!", type=4, ephemeral=True)
+        return
+    label = res.component.label
+    if session.expression == 'An error occurred.':
+        session.expression = ''
+    if label == 'Exit':
+        del calc_sessions[res.message.id]
+        await res.respond(content='Calculator Closed', type=7)
+        return
+    elif label == '←':
+        session.expression = session.expression[:-1]
+    elif label == 'Clear':
+        session.expression = ''
+    elif label == '=':
+        session.expression = await calculate(session.expression)
+    else:
+        session.expression += label
+    await res.respond(content='', embed=session.embed(), components=buttons, type=7)
+
+@tasks.loop(seconds=30)
+async def expire_calculators():
+    now = datetime.datetime.utcnow()
+    for message_id in [m for m, session in calc_sessions.items() if session.expires < now]:
+        del calc_sessions[message_id]
+
+expire_calculators.start()
@@ -0,0 +1,99 @@
+import asyncio
+
+import discord
+
+from cache import SQLiteCache, MISSING
+
+# guild id -> BulkOverwrite still running there
+jobs = {}
+
+state_path = 'lockdown_state.sqlite3'
+state_ttl = 24 * 3600
+_state = None
+
+
+def job_state():
+    """Progress of unfinished jobs, kept on disk so a restarted job can resume."""
+    global _state
+    if _state is None:
+        _state = SQLiteCache(state_path)
+    return _state
+
+
+class BulkOverwrite:
+    """Sets one role's overwrite on every channel of a guild.
+
+    Categories go first; channels that were synced to their category are
+    re-synced rather than edited on their own, so they stay in sync. Which
+    channels were synced is saved until the job finishes, so running it again
+    after an interruption doesn't mistake children of an already edited
+    category for unsynced. A job for other permissions on the same role
+    replaces that state, since it changes what "synced" meant.
+    """
+
+    def __init__(self, guild, target, *, reason=None, concurrency=10, **permissions):
+        self.guild = guild
+        self.target = target
+        self.reason = reason
+        self.permissions = permissions
+        self.total = len(guild.channels)
+        self.done = 0
+        self.changed = 0
+        self.failed = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.key = '{}:{}'.format(guild.id, target.id)
+        self._failed_categories = set()
+
+    def needs_change(self, channel):
+        overwrite = channel.overwrites_for(self.target)
+        return any(getattr(overwrite, name) != value for name, value in self.permissions.items())
+
+    async def run(self, on_progress=None):
+        if self.guild.id in jobs:
+            raise RuntimeError('already running in this guild')
+        jobs[self.guild.id] = self
+        try:
+            categories = [c for c in self.guild.channels if isinstance(c, discord.CategoryChannel)]
+            channels = [c for c in self.guild.channels if not isinstance(c, discord.CategoryChannel)]
+            saved, _ = job_state().get(self.key)
+            if saved is MISSING or saved['permissions'] != self.permissions:
+                # permissions_synced compares against the category's current
+                # overwrites, so it has to be read before any category changes.
+                self._synced = {c.id for c in channels if c.category is not None and c.permissions_synced}
+            else:
+                self._synced = set(saved['synced'])
+            self._save()
+            await asyncio.gather(*(self._apply(c, False, on_progress) for c in categories))
+            await asyncio.gather(*(self._apply(c, c.id in self._synced, on_progress) for c in channels))
+            if self.failed:
+                self._save()
+            else:
+                job_state().pop(self.key)
+        finally:
+            del jobs[self.guild.id]
+        return self
+
+    def _save(self):
+        job_state().set(self.key, {'permissions': self.permissions, 'synced': sorted(self._synced)}, state_ttl)
+
+    async def _apply(self, channel, sync, on_progress):
+        if sync and channel.category_id in self._failed_categories:
+            # Syncing to a category that wasn't updated would change nothing.
+            self.failed += 1
+        elif self.needs_change(channel):
+            async with self._semaphore:
+                try:
+                    if sync:
+                        await channel.edit(sync_permissions=True, reason=self.reason)
+                    else:
+                        overwrite = channel.overwrites_for(self.target)
+                        overwrite.update(**self.permissions)
+                        await channel.set_permissions(self.target, overwrite=overwrite, reason=self.reason)
+                    self.changed += 1
+                except discord.HTTPException:
+                    self.failed += 1
+                    if isinstance(channel, discord.CategoryChannel):
+                        self._failed_categories.add(channel.id)
+        self.done += 1
+        if on_progress is not None:
+            await on_progress(self)
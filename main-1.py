@@ -4,15 +4,16 @@ import asyncio
 import datetime
 from discord.ext import commands
 from keep_alive import keep_alive
-
-intents = discord.Intents.all()
+from bot import Nutcrack
+import cluster
+from members import cache_profile, CachedMember
 
 #activity = discord.Streaming(name="YO!", url="https://www.twitch.tv/wallibear")
 #activity = discord.Game(name=f"n!help in {len(client.guilds)}")
 #activity = discord.Activity(name="with discord", type=5)
 activity = discord.Game(game="Discord",name="with discord", type=5)
 
-client = commands.Bot(command_prefix=["N!", "n!"], intents=intents, activity=activity, status=discord.Status.do_not_disturb)
+client = Nutcrack(command_prefix=["N!", "n!"], **cache_profile(), **cluster.shard_kwargs(), activity=activity, status=discord.Status.do_not_disturb)
 
 prefix = "n!" or "N!"
 
@@ -29,37 +30,11 @@ async def pages(ctx):
   #  await ctx.send(embed=em)
 
     contents = ["page 1","page 2", "page 3","page 4"]
-    pages = 4
-    cur_page = 1
-    message = await ctx.send(f"Page {cur_page}/{pages}:\n{contents[cur_page-1]}")
-
-    await message.add_reaction("◀️")
-    await message.add_reaction("▶️")
-
-    def check(reaction, user):
-        return user == ctx.author and str(reaction.emoji) in ["◀️", "▶️"]
-
-    while True:
-        try:
-            reaction, user = await client.wait_for("reaction_add", timeout=60, check=check)
-
-            if str(reaction.emoji) == "▶️" and cur_page != pages:
-                cur_page += 1
-                await message.edit(content=f"Page {cur_page}/{pages}:\n{contents[cur_page-1]}")
-                await message.remove_reaction(reaction, user)
-
-            elif str(reaction.emoji) == "◀️" and cur_page > 1:
-                cur_page -= 1
-                await message.edit(content=f"Page {cur_page}/{pages}:\n{contents[cur_page-1]}")
-                await message.remove_reaction(reaction, user)
-
-            else:
-                await message.remove_reaction(reaction, user)
-        except asyncio.TimeoutError:
-            break
+    pages = [f"Page {i}/{len(contents)}:\n{content}" for i, content in enumerate(contents, 1)]
+    await client.menus.paginate(ctx, pages, ctx.author, timeout=60)
 
 @client.command()
-async def userinfo(ctx, *, user: discord.Member=None):
+async def userinfo(ctx, *, user: CachedMember=None):
     if isinstance(ctx.channel, discord.DMChannel):
       return
     if user is None:
@@ -69,8 +44,13 @@ async def userinfo(ctx, *, user: discord.Member=None):
     embed.set_author(name=str(user), icon_url=user.avatar_url)
     embed.set_thumbnail(url=user.avatar_url)
     embed.add_field(name="Joined", value=user.joined_at.strftime(date_format))
-#    members = sorted(ctx.guild.members, key=lambda m: m.joined_at)
-#    embed.add_field(name="Join position", value=str(members.index(user)+1))
+    join_order = await client.join_order.get(ctx.guild)
+    position = join_order.position(user)
+    if position is not None:
+        embed.add_field(name="Join position", value=f"{position}/{len(join_order)}")
+        before, after = join_order.around(user)
+        neighbours = [f"<@{member_id}>" for member_id in before] + [f"**{user.mention}**"] + [f"<@{member_id}>" for member_id in after]
+        embed.add_field(name="Joined around", value=" → ".join(neighbours), inline=False)
     embed.add_field(name="Registered", value=user.created_at.strftime(date_format))
     if len(user.roles) > 1:
         role_string = ' '.join([r.mention for r in user.roles][1:])
@@ -92,8 +72,9 @@ async def info(ctx):
 @client.command()
 async def serverinfo(ctx):
 
+    stats = await client.stats.get(ctx.guild)
     role_count = len(ctx.guild.roles)
-    list_of_bots = [bot.mention for bot in ctx.guild.members if bot.bot]
+    list_of_bots = [f"<@{bot_id}>" for bot_id in stats.bots]
     staff_roles = ["Owner", "Head Dev", "Dev", "Head Admin", "Admins", "Moderators", "Community Helpers", "Members"]
         
     em = discord.Embed(timestamp=ctx.message.created_at, color=ctx.author.color)
@@ -106,12 +87,13 @@ async def serverinfo(ctx):
     for r in staff_roles:
         role = discord.utils.get(ctx.guild.roles, name=r)
         if role:
-            members = '\n'.join([member.name for member in role.members]) or "None"
-            em.add_field(name=role.name, value=members)
+            members = '\n'.join(stats.sample(role.id)) or "None"
+            em.add_field(name=f"{role.name} [{stats.members(role.id)}]", value=members)
 
     em.add_field(name='Number of roles', value=str(role_count), inline=False)
     em.add_field(name='Number Of Members', value=ctx.guild.member_count, inline=False)
-    em.add_field(name='Bots:', value=(', '.join(list_of_bots)))
+    em.add_field(name='Humans:', value=str(stats.humans))
+    em.add_field(name='Bots:', value=(', '.join(list_of_bots)) or "None")
     em.add_field(name='Created At', value=ctx.guild.created_at.__format__('%A, %d. %B %Y at %H:%M:%S'), inline=False)
     em.set_thumbnail(url=ctx.guild.icon_url)
     em.set_author(name=ctx.author.name, icon_url=ctx.author.avatar_url)
@@ -143,7 +125,7 @@ async def d(ctx):
   name = str(ctx.guild.name)
   description = str(ctx.guild.description)
 
-  owner = str(ctx.guild.owner)
+  owner = str(await client.members.get(ctx.guild, ctx.guild.owner_id))
   id = str(ctx.guild.id)
   region = str(ctx.guild.region)
   memberCount = str(ctx.guild.member_count)
@@ -191,8 +173,8 @@ async def on_ready():
     print(guild)
   
   print(
-    f"-----\nLogged in as: {client.user.name} : {client.user.id}\n-----\nMy current prefix is: {client.command_prefix}\n-----\nInitialize Database\n-----",f"\n{client.user.name} in {len(client.guilds)} servers\n-----"
+    f"-----\nLogged in as: {client.user.name} : {client.user.id}\n-----\nMy current prefix is: {client.command_prefix}\n-----\nInitialize Database\n-----",f"\n{client.user.name} in {(await client.cluster.stats())['guilds']} servers\n-----"
   )
 
-keep_alive()
-client.run(os.getenv("TOKEN"))
\ No newline at end of file
+keep_alive(client)
+cluster.run(client, os.getenv("TOKEN"))
\ No newline at end of file
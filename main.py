@@ -3,22 +3,28 @@ import discord
 import asyncio
 import datetime
 import random
-import aiohttp
 import json
-import requests
 import time
 import io
 import praw
 from bs4 import BeautifulSoup
 from discord.ext import commands
 from keep_alive import keep_alive
+from bot import Nutcrack
+import cluster
+from giphy import Giphy
+from help import NutcrackHelp
+from members import cache_profile, CachedMember
+from dispatch import Dispatcher
+from calculator import calculate, format_result, CalcError
+import lockdown
 
 activity = discord.Streaming(name="Follow MEimmortal007", url="https://www.twitch.tv/MEimmortal007")
 #activity = discord.Game(name=f"n!help in {len(client.guilds)}")
 #activity = discord.Activity(name="with discord", type=5)
 #activity = discord.Game(game="Discord",name="with discord", type=5)
 
-client = commands.Bot(command_prefix=["N!", "n!"], intents=discord.Intents.all(), activity=activity, status=discord.Status.do_not_disturb, help_command=None)
+client = Nutcrack(command_prefix=["N!", "n!"], **cache_profile(), **cluster.shard_kwargs(), activity=activity, status=discord.Status.do_not_disturb, help_command=NutcrackHelp(prefix="n!", command_attrs={'description': "Help command for Nutcrack!"}))
 
 #client.remove_command("help")
 
@@ -26,32 +32,18 @@ prefix = "n!" or "N!"
 
 owner = "<@!812912547937255434>"
 
-async def get_help():
-  em = discord.Embed(title="Help!", description=f"Help command for {client.user.name}!", color=0x5865F2)
-  em.set_footer(text=f"Total commands [{len(client.commands)}]")
-  em.timestamp = datetime.datetime.utcnow()
-  for command in client.walk_commands():
-    description = command.description
-    if not description or description is None or description == "":
-      description = 'No description was provided'
-    em.add_field(name=f"`{prefix}{command.name}{command.signature if command.signature is not None else ''}`", value=description)
-  return em
+giphy_key = "PgVCpPdQHEIaeUcBrpNGXKcnuQS6AVS0"
+giphy = Giphy(client.session, giphy_key)
+dispatcher = Dispatcher(client, client.command_prefix)
+client.metrics.add_cache("giphy", giphy)
+client.metrics.dispatcher = dispatcher
 
 @client.event
 async def on_message(message):
 #  if owner.user.mentioned_in(message):
 #    await message.guild.ban(message.author)
 #    await message.author.send(f"> **First why did you ping <@!812912547937255434>?**\n> _I told you if you ping me you die!_\n> **Fuck you {message.author.mention}**\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you\n**Hahaha**\nFuck you")
-  if message.content == "<@908917461489975307>":
-    em = await get_help()
-    await message.channel.send(embed=em)
-
-  await client.process_commands(message)
-
-@client.command(description = f"Help command for Nutcrack!")
-async def help(ctx):
-  em = await get_help()
-  await ctx.send(embed=em)
+  await dispatcher.handle(message)
 
 @client.command(description = "Some random pages")
 async def pages(ctx):
@@ -74,34 +66,8 @@ async def pages(ctx):
     'https://cdn.discordapp.com/attachments/102817255661772800/219519738781368321/17201a4342e901e5f1bc2a03ad487219c0434c22_hq.gif']
   
     contents = ["\nHello!","\nHello its me again!","\nDidn't you already have enough\nI sware if you got to the next one...","https://media0.giphy.com/media/Ju7l5y9osyymQ/200.gif"]
-    pages = 4
-    cur_page = 1
-    message = await ctx.send(f"Page {cur_page}/{pages}:\n{contents[cur_page-1]}")
-
-    await message.add_reaction("◀️")
-    await message.add_reaction("▶️")
-
-    def check(reaction, user):
-        return user == ctx.author and str(reaction.emoji) in ["◀️", "▶️"]
-
-    while True:
-        try:
-            reaction, user = await client.wait_for("reaction_add", timeout=60, check=check)
-
-            if str(reaction.emoji) == "▶️" and cur_page != pages:
-                cur_page += 1
-                await message.edit(content=f"Page {cur_page}/{pages}:\n{contents[cur_page-1]}")
-                await message.remove_reaction(reaction, user)
-
-            elif str(reaction.emoji) == "◀️" and cur_page > 1:
-                cur_page -= 1
-                await message.edit(content=f"Page {cur_page}/{pages}:\n{contents[cur_page-1]}")
-                await message.remove_reaction(reaction, user)
-
-            else:
-                await message.remove_reaction(reaction, user)
-        except asyncio.TimeoutError:
-            break
+    pages = [f"Page {i}/{len(contents)}:\n{content}" for i, content in enumerate(contents, 1)]
+    await client.menus.paginate(ctx, pages, ctx.author, timeout=60)
 
 @client.command(description = "This command will yo you back")
 async def yo(ctx, something=None):
@@ -118,6 +84,12 @@ async def loop(ctx, l="**Hahaha**"):
   while (v):
     await ctx.send(l)
 
+@client.command(description="Owner's command (only)", hidden=True)
+@commands.is_owner()
+async def dispatchstats(ctx):
+  seen, processed, dispatched = dispatcher.rates()
+  await ctx.send(f"**Messages/sec** since last check\nSeen: `{seen:.2f}`\nProcessed: `{processed:.2f}`\nDispatched: `{dispatched:.2f}`\n\nTotal: `{dispatcher.seen}` seen, `{dispatcher.processed}` processed, `{dispatcher.dispatched}` dispatched")
+
 @client.command(description = "Nuke channel or server (administrator)") 
 @commands.has_permissions(administrator=True)
 async def nuke(ctx, channel: discord.TextChannel = None):
@@ -147,13 +119,37 @@ async def create_role(ctx, *, name):
 async def ok(ctx):
   await ctx.reply(embed=discord.Embed(title="**KO!**"))
 
+async def lock_server(ctx, send_messages, action):
+  job = lockdown.jobs.get(ctx.guild.id)
+  if job:
+    await ctx.reply(f"I'm already updating this server ({job.done}/{job.total} channels), run it again once it's done!")
+    return
+  job = lockdown.BulkOverwrite(ctx.guild, ctx.guild.default_role, reason=f"{ctx.author.name} {action} {ctx.guild.name} with --server", send_messages=send_messages)
+  status = await ctx.send(f"Updating {ctx.guild.name}: 0/{job.total} channels...")
+  last_edit = time.monotonic()
+
+  async def progress(job):
+    nonlocal last_edit
+    if time.monotonic() - last_edit > 2:
+      last_edit = time.monotonic()
+      await status.edit(content=f"Updating {ctx.guild.name}: {job.done}/{job.total} channels...")
+
+  try:
+    await job.run(progress)
+  except RuntimeError:
+    await status.edit(content="I'm already updating this server, run it again once it's done!")
+    return
+  summary = f"{action.title()} {ctx.guild.name}! Changed {job.changed}, {job.total - job.changed - job.failed} already done"
+  if job.failed:
+    summary += f", {job.failed} failed (run it again to retry)"
+  await status.edit(content=summary)
+
 @client.command()
 @commands.has_permissions(manage_channels=True)
 async def lock(ctx, channel : discord.TextChannel=None, setting=None):
     if setting == '--server':
-      for channel in ctx.guild.channels:
-        await channel.set_permissions(ctx.guild.default_role, reason=f"{ctx.author.name} locked {channel.name} with --server", send_messages=False)
-      await ctx.send("Locked down server")
+      await lock_server(ctx, False, "locked")
+      return
     if channel is None:
       channel = ctx.message.channel
     await channel.set_permissions(ctx.guild.default_role, reason=f"{ctx.author.name} locked {channel.name}", send_messages=False)
@@ -163,9 +159,8 @@ async def lock(ctx, channel : discord.TextChannel=None, setting=None):
 @commands.has_permissions(manage_channels=True)
 async def unlock(ctx, channel : discord.TextChannel=None, setting=None):
     if setting == '--server':
-      for channel in ctx.guild.channels:
-        await channel.set_permissions(ctx.guild.default_role, reason=f"{ctx.author.name} unlocked {channel.name} with --server", send_messages=True)
-      await ctx.send(f"Unlocked {ctx.guild.name}")
+      await lock_server(ctx, True, "unlocked")
+      return
     if channel is None:
       channel = ctx.message.channel
     await channel.set_permissions(ctx.guild.default_role, reason=f"{ctx.author.name} unlocked {channel.name}", send_messages=True)
@@ -173,7 +168,7 @@ async def unlock(ctx, channel : discord.TextChannel=None, setting=None):
 
 @client.command()
 async def serverowner(ctx):
-  owner = ctx.guild.owner
+  owner = await client.members.get(ctx.guild, ctx.guild.owner_id)
   await ctx.reply(embed=discord.Embed(title=f"{ctx.guild.name} Owner", description=f"This server owner is ('{owner}')[Nick = '{owner.nick}']", inline=True))
 
 @client.command()
@@ -181,7 +176,7 @@ async def serverinfo(ctx):
   name = str(ctx.guild.name)
   description = str(ctx.guild.description)
 
-  owner = str(ctx.guild.owner)
+  owner = str(await client.members.get(ctx.guild, ctx.guild.owner_id))
   id = str(ctx.guild.id)
 #  region = str(ctx.guild.region)
   memberCount = str(ctx.guild.member_count)
@@ -224,7 +219,8 @@ async def cockroach(ctx):
 
 @client.command()
 async def servers(ctx):
-  await ctx.reply(embed=discord.Embed(title="**Servers**", description=f"{client.user.name} in **{len(client.guilds)} servers**!"))
+  stats = await client.cluster.stats()
+  await ctx.reply(embed=discord.Embed(title="**Servers**", description=f"{client.user.name} in **{stats['guilds']} servers** with **{stats['users']} users**!"))
 
 @client.command()
 async def hi(ctx):
@@ -247,50 +243,30 @@ async def announce(ctx, channel : discord.TextChannel, *, message):
     return
 
   msg = await ctx.channel.send(embed=discord.Embed(title=f"{ctx.author.mention} are you sure?"))
-  await msg.add_reaction(u"\u2705")
-  await msg.add_reaction(u"\U0001F6AB")
+  confirmed = await client.menus.confirm(msg, ctx.author, timeout=30.0)
 
-  try:
-    reaction, user = await client.wait_for("reaction_add", check=lambda reaction, user: user == ctx.author and reaction.emoji in [u"\u2705", u"\U0001F6AB"], timeout=30.0)
-
-
-  except asyncio.TimeoutError:
+  if confirmed is None:
     await ctx.channel.send("Please don't ignore me!")
-    return
-
+  elif confirmed:
+    await channel.send(message)
+    await ctx.reply(":white_check_mark: Announcement have been sent!")
   else:
-    if reaction.emoji == u"\u2705":
-      await channel.send(message)
-      await ctx.reply(":white_check_mark: Announcement have been sent!")
-      return
-            
-    else:
-      await ctx.channel.send("Ok the announcement has been canceled!")
-      return
+    await ctx.channel.send("Ok the announcement has been canceled!")
 
 @client.command(aliases=["giphy"],pass_context=True)
 async def gif(ctx, *, search=""):
     try:
         author = ctx.message.author
         user_name = author.name
-        session = aiohttp.ClientSession()
         print(search)
         if search == '':
             embed = discord.Embed(title=f"{user_name} Random GIF",
                                     description=f"", color=3447003)
-            response = await session.get('https://api.giphy.com/v1/gifs/random?api_key=PgVCpPdQHEIaeUcBrpNGXKcnuQS6AVS0')
-            data = json.loads(await response.text())
-            embed.set_image(url=data['data']['images']['original']['url'])
+            embed.set_image(url=await giphy.random())
         else:
             embed = discord.Embed(title=f"{user_name} GIF : **{search}**  ",
                                     description=f"", color=3447003)
-            search.replace(' ', '%20')
-            response = await session.get('http://api.giphy.com/v1/gifs/search?q=' + search + '&api_key=PgVCpPdQHEIaeUcBrpNGXKcnuQS6AVS0&limit=10')
-            await session.close()
-            data = json.loads(await response.text())
-            gif_choice = random.randint(0, 9)
-            embed.set_image(url=data['data'][gif_choice]['images']['original']['url'])
-        await session.close()
+            embed.set_image(url=await giphy.random(search))
         await ctx.send(embed=embed)
     except:
         msg = f"{ctx.message.author.mention} GIF not found for **{search}**" 
@@ -420,37 +396,38 @@ async def addreaction(ctx, channel : discord.TextChannel=None, msgid : int=None,
   await message.add_reaction(emoji)
 
 @client.command()
-async def add(ctx, add1 : int=0, add2 : int=0, add3 : int=0, add4 : int=0):
-  if add1 == 0:
+async def add(ctx, *numbers):
+  if len(numbers) < 1:
     await ctx.reply("Add your first number first!")
     return
-  if add2 == 0:
+  if len(numbers) < 2:
     await ctx.reply("Add you second number to add to the first number!")
     return
-  try:
-    res = add1+add2+add3+add4
-    await ctx.reply(f"Answer is [{res}]")
-  except:
-    await ctx.reply("I am bad at math!")
+  await reply_calculation(ctx, " + ".join(f"({n})" for n in numbers))
 
 @client.command()
-async def multiply(ctx, mul1 : int=0, mul2 : int=0, mul3 : int=1, mul4 : int=1):
-  if mul1 == 0:
+async def multiply(ctx, *numbers):
+  if len(numbers) < 1:
     await ctx.reply("Add your first number first!")
     return
-  if mul2 == 0:
+  if len(numbers) < 2:
     await ctx.reply("Add you second number to add to the first number!")
     return
+  await reply_calculation(ctx, " * ".join(f"({n})" for n in numbers))
+
+async def reply_calculation(ctx, expression):
   try:
-    res = mul1*mul2*mul3*mul4
-    await ctx.reply(f"Answer is [{res}]")
-  except:
+    res = await calculate(expression)
+  except CalcError:
     await ctx.reply("I am bad at math!")
+    return
+  await ctx.reply(f"Answer is [{format_result(res)}]")
 
 @client.command()
-async def status(ctx, member : discord.Member=None):
+async def status(ctx, member : CachedMember=None):
   if not member:
-    member = ctx.author
+    # The message's own author object carries no presence.
+    member = await client.members.get(ctx.guild, ctx.author.id)
   embed = discord.Embed(title=f"{member.mention}'s Status")
   embed.add_field(name='Status Now', value=member.status)
   await ctx.send(embed=embed)
@@ -459,15 +436,9 @@ async def status(ctx, member : discord.Member=None):
 async def noice(ctx, member : discord.Member=None):
   if not member:
     member = ctx.author
-  session = aiohttp.ClientSession()
-  search = "noice"
-  search.replace(' ', '%20')
-  response = await session.get('http://api.giphy.com/v1/gifs/search?q=' + search + '&api_key=PgVCpPdQHEIaeUcBrpNGXKcnuQS6AVS0&limit=10')
-  await session.close()
-  data = json.loads(await response.text())
-  gif_choice = random.randint(0, 9)
+  url = await giphy.random('noice')
   embed = discord.Embed(title=f"**{member.mention} Noice!**")
-  embed.set_image(url=data['data'][gif_choice]['images']['original']['url'])
+  embed.set_image(url=url)
   await ctx.reply(embed=embed)
 
 @client.command(hidden=True)
@@ -490,22 +461,14 @@ async def dm(ctx, user_id=None, *, args=None):
 @client.command()
 async def q(ctx):
   msg = await ctx.channel.send(embed=discord.Embed(title=f"{ctx.author.mention} am I in your server?"))
-  await msg.add_reaction(u"\u2705")
-  await msg.add_reaction(u"\U0001F6AB")
-
-  try:
-        reaction, user = await client.wait_for("reaction_add", check=lambda reaction, user: user == ctx.author and reaction.emoji in [u"\u2705", u"\U0001F6AB"], timeout=30.0)
-
-
-  except asyncio.TimeoutError:
-        await ctx.channel.send("Ouch you ignored me.")
+  confirmed = await client.menus.confirm(msg, ctx.author, timeout=30.0)
 
+  if confirmed is None:
+    await ctx.channel.send("Ouch you ignored me.")
+  elif confirmed:
+    await ctx.channel.send("Yaaaaa lets gooo..")
   else:
-        if reaction.emoji == u"\u2705":
-            await ctx.channel.send("Yaaaaa lets gooo..")
-
-        else:
-            await ctx.channel.send("Ouch, that hurts...\nAdd me right now!")    
+    await ctx.channel.send("Ouch, that hurts...\nAdd me right now!")
 
 #@client.command(hidden=True)
 #async def hentai(ctx, *,type=""):
@@ -542,7 +505,7 @@ async def q(ctx):
 
 @client.command()
 async def get(ctx):
-  i = requests.get('https://api.ipify.org').text
+  i = await client.public_ip.get()
   await ctx.send("Here is my ip: " + i)
 
 @client.command(hidden=True)
@@ -565,7 +528,7 @@ async def hentai(ctx, *, search):
         await ctx.reply("Please enter hentai type to search!")
       try:
         await ctx.message.delete()
-        req = requests.get(f"https://nekobot.xyz/api/image?type={search}").json()
+        req = await client.session.get_json("https://nekobot.xyz/api/image", params={'type': search})
         url = req['message']
         print(url)
         embed = discord.Embed(
@@ -675,7 +638,7 @@ async def k(ctx):
       await ctx.send(embed=embed)
 
 @client.command()
-async def avatar(ctx, member : discord.Member=None):
+async def avatar(ctx, member : CachedMember=None):
   if not member:
     member = ctx.author
  
@@ -690,10 +653,12 @@ async def avatar(ctx, member : discord.Member=None):
 async def on_ready():
   print(f"{client.user} in:")
   for guild in client.guilds:
-    print(len(guild.members))
-  i = requests.get('https://api.ipify.org').text
+    print(guild.member_count)
+  i = await client.public_ip.get()
+  stats = await client.cluster.stats()
+  shards = ", ".join(f"#{shard} {latency * 1000:.0f}ms" for shard, latency in stats['latencies'].items())
   print(
-    f"-----\nLogged in as: {client.user.name} : {client.user.id}\n-----\nMy current prefix is: {client.command_prefix}\n-----\nTotal commands [{len(client.commands)}]\n-----\n{client.user.name} in {len(client.guilds)} servers\n-----\nMy ip: {i}"
+    f"-----\nLogged in as: {client.user.name} : {client.user.id}\n-----\nMy current prefix is: {client.command_prefix}\n-----\nTotal commands [{len(client.commands)}]\n-----\n{client.user.name} in {stats['guilds']} servers ({len(client.guilds)} on this cluster)\n-----\nShards: {shards}\n-----\nMy ip: {i}"
   )
   #await client.change_presence(status=discord.Status.dnd, activity = discord.Activity(type=discord.ActivityType.watching, name=f"{len(client.guilds)} servers | 2467 users"))
 
@@ -707,5 +672,5 @@ async def on_ready():
 #        await asyncio.sleep(1)
 
 #client.loop.create_task(background_task())
-keep_alive()
-client.run(os.getenv("TOKEN"))
\ No newline at end of file
+keep_alive(client)
+cluster.run(client, os.getenv("TOKEN"))
\ No newline at end of file
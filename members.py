@@ -0,0 +1,127 @@
+import asyncio
+import os
+import re
+import traceback
+
+import discord
+from discord.ext import commands
+
+from cache import LRUCache, MISSING
+
+
+def cache_profile(name=None):
+    """Client kwargs for a member caching profile.
+
+    ``full`` is discord.py's behaviour with every intent: chunk every guild at
+    startup and keep every member. ``lean`` (the default) keeps the member and
+    presence events but only caches members in voice, and leaves chunking to
+    the first command that needs a guild's full member list. Set
+    CACHE_PROFILE to pick one.
+    """
+    name = name or os.getenv("CACHE_PROFILE", "lean")
+    if name == "full":
+        return {
+            "intents": discord.Intents.all(),
+            "member_cache_flags": discord.MemberCacheFlags.all(),
+            "chunk_guilds_at_startup": True,
+        }
+    if name == "lean":
+        intents = discord.Intents.default()
+        intents.members = True
+        intents.presences = True
+        return {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags(voice=True, joined=False, online=False),
+            "chunk_guilds_at_startup": False,
+        }
+    raise ValueError(f"Unknown cache profile {name!r}")
+
+
+class MemberLookup:
+    """Fetches members on demand instead of keeping every guild cached."""
+
+    def __init__(self, bot, *, maxsize=1024, ttl=60):
+        self.bot = bot
+        self.ttl = ttl
+        self.cache = LRUCache(maxsize)
+        self._chunking = {}
+
+    async def get(self, guild, user_id):
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        key = (guild.id, user_id)
+        member = self.cache.get(key)
+        if member is not MISSING:
+            return member
+
+        if self.bot.intents.presences:
+            # Over the gateway, so the member comes back with its status.
+            found = await guild.query_members(user_ids=[user_id], presences=True, cache=False)
+            member = found[0] if found else None
+        else:
+            try:
+                member = await guild.fetch_member(user_id)
+            except discord.NotFound:
+                member = None
+        self.cache.set(key, member, self.ttl)
+        return member
+
+    async def chunk(self, guild):
+        """Every member of ``guild``, for indexes that need them all.
+
+        The members are requested over the gateway but not added to the member
+        cache; callers keep whatever compact form of them they need.
+        """
+        if guild.chunked:
+            return guild.members
+        task = self._chunking.get(guild.id)
+        if task is None:
+            task = self._chunking[guild.id] = asyncio.ensure_future(guild.chunk(cache=False))
+            task.add_done_callback(lambda _: self._chunking.pop(guild.id, None))
+        return await asyncio.shield(task)
+
+
+class MemberEvents:
+    """Raw GUILD_MEMBER_ADD/UPDATE/REMOVE payloads, taken from discord.py's parsers.
+
+    discord.py only dispatches member_update and member_remove for cached
+    members, and an on_socket_response listener would cost a Task for every
+    gateway payload. Handlers here run inline, and only for these events.
+    """
+
+    events = ('GUILD_MEMBER_ADD', 'GUILD_MEMBER_UPDATE', 'GUILD_MEMBER_REMOVE')
+
+    def __init__(self, bot):
+        self._handlers = []
+        # The gateway looks parsers up in this dict on every event, so
+        # replacing its entries hooks every shard, reconnects included.
+        parsers = bot._connection.parsers
+        for event in self.events:
+            parsers[event] = self._wrap(event, parsers[event])
+
+    def subscribe(self, handler):
+        """Call ``handler(event, data)`` after discord.py has parsed each member event."""
+        self._handlers.append(handler)
+
+    def _wrap(self, event, parse):
+        def parser(data):
+            parse(data)
+            for handler in self._handlers:
+                try:
+                    handler(event, data)
+                except Exception:
+                    traceback.print_exc()
+        return parser
+
+
+class CachedMember(commands.MemberConverter):
+    """Member converter that looks up mentions and IDs through the bot's MemberLookup."""
+
+    async def convert(self, ctx, argument):
+        match = re.match(r'<@!?([0-9]{15,20})>$', argument) or re.match(r'([0-9]{15,20})$', argument)
+        if match and ctx.guild is not None:
+            member = await ctx.bot.members.get(ctx.guild, int(match.group(1)))
+            if member is not None:
+                return member
+        return await super().convert(ctx, argument)
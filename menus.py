@@ -0,0 +1,154 @@
+import asyncio
+
+import discord
+
+
+class Menu:
+    """A reaction menu owned by one user and bound to one message."""
+
+    emojis = ()
+
+    def __init__(self, owner, *, timeout=60):
+        self.owner_id = owner.id
+        self.timeout = timeout
+        self.message = None
+        self.router = None
+        self._expiry = None
+
+    async def on_reaction(self, emoji, payload):
+        # Subclasses handle their own buttons; anything else is ignored.
+        pass
+
+    async def on_timeout(self):
+        pass
+
+    async def start(self, router, message):
+        self.message = message
+        router.register(self)
+        for emoji in self.emojis:
+            await message.add_reaction(emoji)
+
+    def stop(self):
+        if self.router is not None:
+            self.router.unregister(self)
+
+    async def clear(self, payload):
+        try:
+            await self.message.remove_reaction(payload.emoji, discord.Object(payload.user_id))
+        except discord.HTTPException:
+            pass
+
+
+class Paginator(Menu):
+    """Pages through any sequence of strings or embeds.
+
+    ``pages`` only needs ``len()`` and indexing, so a lazy sequence renders
+    one page at a time.
+    """
+
+    emojis = ("◀️", "▶️")
+
+    def __init__(self, pages, owner, *, timeout=60):
+        super().__init__(owner, timeout=timeout)
+        self.pages = pages
+        self.current = 0
+
+    def render(self, index):
+        page = self.pages[index]
+        if isinstance(page, discord.Embed):
+            return {'embed': page}
+        return {'content': page}
+
+    async def start(self, router, destination):
+        message = await destination.send(**self.render(self.current))
+        if len(self.pages) > 1:
+            await super().start(router, message)
+        return message
+
+    async def show(self, index):
+        if 0 <= index < len(self.pages) and index != self.current:
+            self.current = index
+            await self.message.edit(**self.render(index))
+
+    async def on_reaction(self, emoji, payload):
+        if emoji == "▶️":
+            await self.show(self.current + 1)
+        else:
+            await self.show(self.current - 1)
+        await self.clear(payload)
+
+
+class Confirm(Menu):
+    """Yes/no prompt; ``result`` resolves to True, False or None on timeout."""
+
+    emojis = ("✅", "\U0001F6AB")
+
+    def __init__(self, owner, *, timeout=30):
+        super().__init__(owner, timeout=timeout)
+        self.result = asyncio.get_event_loop().create_future()
+
+    async def on_reaction(self, emoji, payload):
+        self.stop()
+        if not self.result.done():
+            self.result.set_result(emoji == "✅")
+
+    async def on_timeout(self):
+        if not self.result.done():
+            self.result.set_result(None)
+
+
+class MenuRouter:
+    """Routes reaction events to open menus by message ID.
+
+    One raw listener serves every menu, and idle menus expire through a
+    loop timer that is pushed back whenever the owner reacts.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._menus = {}
+        bot.add_listener(self.on_raw_reaction_add, 'on_raw_reaction_add')
+
+    def __len__(self):
+        return len(self._menus)
+
+    def register(self, menu):
+        menu.router = self
+        self._menus[menu.message.id] = menu
+        self._touch(menu)
+
+    def unregister(self, menu):
+        if menu._expiry is not None:
+            menu._expiry.cancel()
+            menu._expiry = None
+        self._menus.pop(menu.message.id, None)
+
+    def _touch(self, menu):
+        if menu._expiry is not None:
+            menu._expiry.cancel()
+        menu._expiry = self.bot.loop.call_later(menu.timeout, self._expire, menu)
+
+    def _expire(self, menu):
+        menu._expiry = None
+        self.unregister(menu)
+        asyncio.ensure_future(menu.on_timeout())
+
+    async def on_raw_reaction_add(self, payload):
+        menu = self._menus.get(payload.message_id)
+        if menu is None or payload.user_id != menu.owner_id:
+            return
+        emoji = str(payload.emoji)
+        if emoji not in menu.emojis:
+            return
+        self._touch(menu)
+        await menu.on_reaction(emoji, payload)
+
+    async def paginate(self, destination, pages, owner, *, timeout=60):
+        menu = Paginator(pages, owner, timeout=timeout)
+        await menu.start(self, destination)
+        return menu
+
+    async def confirm(self, message, owner, *, timeout=30):
+        menu = Confirm(owner, timeout=timeout)
+        await menu.start(self, message)
+        return await menu.result
@@ -0,0 +1,120 @@
+import asyncio
+import math
+
+
+def sample(name, value, **labels):
+    if labels:
+        name += "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+    if math.isnan(value):
+        value = "NaN"
+    elif math.isinf(value):
+        value = "+Inf" if value > 0 else "-Inf"
+    return f"{name} {value}"
+
+
+class Metrics:
+    """Bot health numbers, rendered in the Prometheus text format.
+
+    Anything with ``hits``/``misses`` counters can be added as a cache, and
+    anything with GuildExecutor's counters as an executor.
+    """
+
+    def __init__(self, bot, lag_interval=1):
+        self.bot = bot
+        self.lag_interval = lag_interval
+        self.loop_lag = 0.0
+        self.commands_completed = 0
+        self.commands_failed = 0
+        self.dispatcher = None
+        self._caches = {}
+        self._executors = {}
+        self._lag_task = None
+        # Failures are counted by Nutcrack.invoke: an on_command_error
+        # listener would stop Bot.on_command_error printing tracebacks.
+        bot.add_listener(self.on_command_completion, 'on_command_completion')
+
+    def add_cache(self, name, cache):
+        self._caches[name] = cache
+
+    def add_executor(self, name, executor):
+        self._executors[name] = executor
+
+    def remove(self, name):
+        self._caches.pop(name, None)
+        self._executors.pop(name, None)
+
+    async def on_command_completion(self, ctx):
+        self.commands_completed += 1
+
+    def start(self):
+        if self._lag_task is None:
+            self._lag_task = asyncio.ensure_future(self._measure_lag())
+
+    def close(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    async def _measure_lag(self):
+        # How late a sleep wakes up is how long something else held the loop.
+        loop = asyncio.get_event_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag = max(0.0, loop.time() - started - self.lag_interval)
+
+    def render(self):
+        lines = [
+            "# HELP nutcrack_gateway_latency_seconds Heartbeat latency per shard.",
+            "# TYPE nutcrack_gateway_latency_seconds gauge",
+        ]
+        lines += [sample("nutcrack_gateway_latency_seconds", latency, shard=shard) for shard, latency in self.bot.latencies]
+        lines += [
+            "# HELP nutcrack_event_loop_lag_seconds How late the last loop wakeup was.",
+            "# TYPE nutcrack_event_loop_lag_seconds gauge",
+            sample("nutcrack_event_loop_lag_seconds", self.loop_lag),
+            "# HELP nutcrack_guilds Guilds on this process.",
+            "# TYPE nutcrack_guilds gauge",
+            sample("nutcrack_guilds", len(self.bot.guilds)),
+            "# HELP nutcrack_commands_total Commands run, by outcome.",
+            "# TYPE nutcrack_commands_total counter",
+            sample("nutcrack_commands_total", self.commands_completed, status="completed"),
+            sample("nutcrack_commands_total", self.commands_failed, status="failed"),
+        ]
+        if self.dispatcher is not None:
+            lines += [
+                "# HELP nutcrack_messages_total Gateway messages, by how far they got through dispatch.",
+                "# TYPE nutcrack_messages_total counter",
+                sample("nutcrack_messages_total", self.dispatcher.seen, stage="seen"),
+                sample("nutcrack_messages_total", self.dispatcher.processed, stage="processed"),
+                sample("nutcrack_messages_total", self.dispatcher.dispatched, stage="dispatched"),
+            ]
+        if self._caches:
+            lines += [
+                "# HELP nutcrack_cache_requests_total Cache lookups, by result.",
+                "# TYPE nutcrack_cache_requests_total counter",
+            ]
+            for name, cache in self._caches.items():
+                lines.append(sample("nutcrack_cache_requests_total", cache.hits, cache=name, result="hit"))
+                lines.append(sample("nutcrack_cache_requests_total", cache.misses, cache=name, result="miss"))
+            lines += [
+                "# HELP nutcrack_cache_hit_ratio Share of lookups answered from the cache.",
+                "# TYPE nutcrack_cache_hit_ratio gauge",
+            ]
+            for name, cache in self._caches.items():
+                total = cache.hits + cache.misses
+                lines.append(sample("nutcrack_cache_hit_ratio", cache.hits / total if total else 0.0, cache=name))
+        if self._executors:
+            lines += [
+                "# HELP nutcrack_executor_queue_depth Jobs waiting or running.",
+                "# TYPE nutcrack_executor_queue_depth gauge",
+            ]
+            lines += [sample("nutcrack_executor_queue_depth", executor.queue_depth, executor=name) for name, executor in self._executors.items()]
+            lines += [
+                "# HELP nutcrack_executor_jobs_total Finished jobs, by outcome.",
+                "# TYPE nutcrack_executor_jobs_total counter",
+            ]
+            for name, executor in self._executors.items():
+                lines.append(sample("nutcrack_executor_jobs_total", executor.completed, executor=name, result="completed"))
+                lines.append(sample("nutcrack_executor_jobs_total", executor.timed_out, executor=name, result="timed_out"))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,51 @@
+from urllib.parse import urlparse, parse_qs
+
+import discord
+from youtube_dl.extractor.youtube import YoutubeIE
+
+
+def acodec(url):
+    """Audio codec of a googlevideo stream URL, from youtube_dl's format table."""
+    itag = parse_qs(urlparse(url).query).get('itag', [''])[0]
+    return YoutubeIE._formats.get(itag, {}).get('acodec')
+
+
+def is_opus(url, codec=None):
+    # Only pass through when the codec is known: WebM alone can also be
+    # Vorbis (itag 171), which the copy into Opus can't carry.
+    return (codec or acodec(url)) == 'opus'
+
+
+def audio_source(url, bitrate=128, codec=None, **ffmpeg_options):
+    """Opus source for ``url`` that avoids re-encoding whenever it can.
+
+    Opus-in-WebM streams are only remuxed by FFmpeg and their packets go
+    straight to Discord. Anything else is encoded to Opus inside FFmpeg
+    rather than decoded to PCM and encoded again in the bot process.
+    """
+    if is_opus(url, codec):
+        return discord.FFmpegOpusAudio(url, codec='opus', bitrate=bitrate, **ffmpeg_options)
+    return discord.FFmpegOpusAudio(url, bitrate=bitrate, **ffmpeg_options)
+
+
+class PassthroughDiscord:
+    """Stands in for the ``discord`` module inside DiscordUtils.
+
+    DiscordUtils builds every source as
+    ``discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(url, **opts))``;
+    this swaps that for ``audio_source`` and leaves everything else alone.
+    """
+
+    def __getattr__(self, name):
+        return getattr(discord, name)
+
+    @staticmethod
+    def FFmpegPCMAudio(source, **ffmpeg_options):
+        return audio_source(source, **ffmpeg_options)
+
+    @staticmethod
+    def PCMVolumeTransformer(source, volume=1.0):
+        # Volume needs decoded PCM, which is exactly what we are skipping.
+        if source.is_opus():
+            return source
+        return discord.PCMVolumeTransformer(source, volume)
@@ -0,0 +1,114 @@
+import time
+from datetime import timezone
+from collections import OrderedDict, deque, namedtuple
+
+Snipe = namedtuple("Snipe", "message_id author_id channel_id content created_at deleted_at")
+
+# Rough per-record cost beyond the content itself: the tuple, its ints and
+# the deque slot.
+record_overhead = 200
+
+
+def record_size(snipe):
+    return record_overhead + len(snipe.content)
+
+
+class SnipeStore:
+    """Recently deleted messages, per channel, inside a fixed memory budget.
+
+    Every channel keeps a ring buffer of its last ``per_channel`` deletions.
+    When the whole store goes over ``budget`` bytes, the guilds that have gone
+    longest without a deletion are dropped first. Entries older than ``ttl``
+    seconds are never returned and are cleared out by ``sweep``.
+    """
+
+    def __init__(self, per_channel=10, budget=4 * 1024 * 1024, ttl=6 * 3600):
+        self.per_channel = per_channel
+        self.budget = budget
+        self.ttl = ttl
+        self.size = 0
+        # guild id -> OrderedDict(channel id -> deque of Snipe), both kept in
+        # least recently written order.
+        self._guilds = OrderedDict()
+        self._guild_sizes = {}
+
+    def __len__(self):
+        return sum(len(buffer) for channels in self._guilds.values() for buffer in channels.values())
+
+    def add(self, message):
+        if message.guild is None:
+            return
+        snipe = Snipe(
+            message.id,
+            message.author.id,
+            message.channel.id,
+            message.content,
+            # discord.py gives naive UTC datetimes; .timestamp() alone would
+            # read them as local time.
+            message.created_at.replace(tzinfo=timezone.utc).timestamp(),
+            time.time(),
+        )
+        guild_id = message.guild.id
+        channels = self._guilds.get(guild_id)
+        if channels is None:
+            channels = self._guilds[guild_id] = OrderedDict()
+            self._guild_sizes[guild_id] = 0
+        self._guilds.move_to_end(guild_id)
+
+        buffer = channels.get(snipe.channel_id)
+        if buffer is None:
+            buffer = channels[snipe.channel_id] = deque()
+        channels.move_to_end(snipe.channel_id)
+        if len(buffer) >= self.per_channel:
+            self._account(guild_id, -record_size(buffer.popleft()))
+        buffer.append(snipe)
+        self._account(guild_id, record_size(snipe))
+        self._evict(guild_id)
+
+    def get(self, guild_id, channel_id, index=1):
+        """The ``index``-th most recent deletion in a channel, or None."""
+        channels = self._guilds.get(guild_id)
+        buffer = channels and channels.get(channel_id)
+        if not buffer:
+            return None
+        self._expire(guild_id, channel_id, time.time() - self.ttl)
+        if index < 1 or index > len(buffer):
+            return None
+        return buffer[-index]
+
+    def count(self, guild_id, channel_id):
+        channels = self._guilds.get(guild_id)
+        return len(channels.get(channel_id, ())) if channels else 0
+
+    def sweep(self):
+        cutoff = time.time() - self.ttl
+        for guild_id in list(self._guilds):
+            for channel_id in list(self._guilds[guild_id]):
+                self._expire(guild_id, channel_id, cutoff)
+
+    def _account(self, guild_id, delta):
+        self.size += delta
+        self._guild_sizes[guild_id] += delta
+
+    def _expire(self, guild_id, channel_id, cutoff):
+        channels = self._guilds[guild_id]
+        buffer = channels[channel_id]
+        while buffer and buffer[0].deleted_at < cutoff:
+            self._account(guild_id, -record_size(buffer.popleft()))
+        if not buffer:
+            del channels[channel_id]
+        if not channels:
+            self._drop(guild_id)
+
+    def _drop(self, guild_id):
+        del self._guilds[guild_id]
+        self.size -= self._guild_sizes.pop(guild_id)
+
+    def _evict(self, current):
+        while self.size > self.budget and len(self._guilds) > 1:
+            self._drop(next(iter(self._guilds)))
+        # A single guild over budget on its own loses its quietest channels.
+        channels = self._guilds[current]
+        while self.size > self.budget and len(channels) > 1:
+            _, buffer = channels.popitem(last=False)
+            self._account(current, -sum(record_size(snipe) for snipe in buffer))
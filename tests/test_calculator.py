@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+import calculator
+from calculator import CalcError, calculate, evaluate, format_result
+
+
+@pytest.mark.parametrize("expression", ['1+' * 999 + '1', '-' * 1999 + '1'])
+def test_deep_nesting_is_a_calc_error(expression):
+    with pytest.raises(CalcError):
+        evaluate(expression)
+
+
+def test_deep_nesting_through_calculate():
+    with pytest.raises(CalcError):
+        asyncio.run(calculate('-' * 1999 + '1'))
+
+
+def test_plain_arithmetic():
+    assert evaluate("(1) + (2) * 3") == 7
+
+
+@pytest.mark.parametrize("expression", ['(-1)**0.5', '(-1)**0.5 % 2', '(-1)**0.5 // 1'])
+def test_complex_results_are_a_calc_error(expression):
+    with pytest.raises(CalcError):
+        evaluate(expression)
+
+
+def slow_evaluate(expression, limit=calculator.inline_bits):
+    if limit == calculator.inline_bits:
+        raise calculator.TooExpensive()
+    if expression == "slow":
+        time.sleep(30)
+    time.sleep(1)
+    return 42
+
+
+def test_timeout_does_not_break_other_jobs(monkeypatch):
+    monkeypatch.setattr(calculator, "evaluate", slow_evaluate)
+    monkeypatch.setattr(calculator, "timeout", 1.5)
+
+    async def run():
+        slow = asyncio.ensure_future(calculate("slow"))
+        # Still running on the other worker when "slow" times out.
+        await asyncio.sleep(1)
+        fast = asyncio.ensure_future(calculate("fast"))
+        return await asyncio.gather(slow, fast, return_exceptions=True)
+
+    slow, fast = asyncio.run(run())
+    assert isinstance(slow, CalcError)
+    assert fast == 42
+
+
+def test_results_fit_in_a_message():
+    assert format_result(2 ** 100) == str(2 ** 100)
+    assert len(format_result(2 ** 10000)) < 1900
+    assert "3011 digit number" in format_result(2 ** 10000)
@@ -0,0 +1,29 @@
+import asyncio
+import types
+
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("aiohttp")
+
+from bot import Nutcrack
+
+
+def test_command_errors_still_print_tracebacks(capsys):
+    loop = asyncio.new_event_loop()
+    try:
+        bot = Nutcrack(command_prefix="n!", loop=loop)
+        assert not bot.extra_events.get('on_command_error')
+
+        try:
+            raise ValueError("boom")
+        except ValueError as error:
+            exception = error
+        ctx = types.SimpleNamespace(command=types.SimpleNamespace(name="boom"), cog=None)
+        loop.run_until_complete(bot.on_command_error(ctx, exception))
+    finally:
+        loop.close()
+
+    err = capsys.readouterr().err
+    assert "Ignoring exception in command" in err
+    assert "ValueError: boom" in err
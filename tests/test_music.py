@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+pytest.importorskip("DiscordUtils")
+pytest.importorskip("youtube_dl")
+
+music = pytest.importorskip("cogs.music")
+
+
+def test_song_end_is_handled_on_the_loop(monkeypatch):
+    monkeypatch.setattr(music.music_module, "discord", types.SimpleNamespace(
+        PCMVolumeTransformer=lambda source: source,
+        FFmpegPCMAudio=lambda source, **opts: source,
+    ))
+    threads = []
+
+    async def on_play(ctx, song):
+        threads.append(("on_play", threading.current_thread()))
+
+    def play(source, after):
+        threads.append(("play", threading.current_thread()))
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        song = types.SimpleNamespace(is_looping=False, source="stream")
+        ctx = types.SimpleNamespace(guild=types.SimpleNamespace(id=1), voice_client=types.SimpleNamespace(play=play))
+        player_music = types.SimpleNamespace(queue=music.QueueMap({1: [song, song]}))
+        # The audio player calls after_func from its own thread.
+        audio = threading.Thread(target=music.check_queue_on_loop, args=(ctx, {}, player_music, music.check_queue_on_loop, on_play, loop))
+        audio.start()
+        audio.join()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return len(player_music.queue[1])
+
+    assert asyncio.run(main()) == 1
+    assert threads == [("play", threading.main_thread()), ("on_play", threading.main_thread())]
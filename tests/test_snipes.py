@@ -0,0 +1,43 @@
+import datetime
+import time
+import types
+
+import pytest
+
+from snipes import SnipeStore
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def deleted(created_at, guild_id=1, channel_id=2, message_id=3):
+    return types.SimpleNamespace(
+        id=message_id,
+        guild=types.SimpleNamespace(id=guild_id),
+        channel=types.SimpleNamespace(id=channel_id),
+        author=types.SimpleNamespace(id=4),
+        content="gone",
+        created_at=created_at,
+    )
+
+
+def test_created_at_round_trips_outside_utc(new_york):
+    sent = datetime.datetime(2021, 12, 1, 22, 13)
+    store = SnipeStore()
+    store.add(deleted(sent))
+    snipe = store.get(1, 2)
+    assert datetime.datetime.utcfromtimestamp(snipe.created_at) == sent
+
+
+def test_ring_buffer_keeps_newest_first():
+    store = SnipeStore(per_channel=2)
+    for message_id in range(3):
+        store.add(deleted(datetime.datetime.utcnow(), message_id=message_id))
+    assert [store.get(1, 2, i).message_id for i in (1, 2)] == [2, 1]
+    assert store.get(1, 2, 3) is None
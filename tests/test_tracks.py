@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+pytest.importorskip("youtube_dl")
+
+from tracks import TrackQueue
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Small blocks so a few dozen songs already span several of them.
+    monkeypatch.setattr(TrackQueue, "block", 4)
+
+
+def test_indexing_and_slicing_match_a_list(small_blocks):
+    songs = list(range(37))
+    queue = TrackQueue(songs)
+    assert len(queue) == len(songs)
+    assert list(queue) == songs
+    for i in range(-len(songs), len(songs)):
+        assert queue[i] == songs[i]
+    for start in range(-5, 40, 3):
+        for stop in range(-5, 40, 4):
+            assert queue[start:stop] == songs[start:stop]
+    assert queue[::3] == songs[::3]
+    with pytest.raises(IndexError):
+        queue[len(songs)]
+
+
+def test_random_operations_match_a_list(small_blocks):
+    rng = random.Random(1234)
+    songs = []
+    queue = TrackQueue()
+    for n in range(3000):
+        op = rng.choice(["append", "appendleft", "insert", "pop", "popleft", "del", "move", "set"])
+        if op == "append":
+            songs.append(n)
+            queue.append(n)
+        elif op == "appendleft":
+            songs.insert(0, n)
+            queue.appendleft(n)
+        elif op == "insert":
+            index = rng.randint(-len(songs) - 2, len(songs) + 2)
+            songs.insert(index, n)
+            queue.insert(index, n)
+        elif not songs:
+            continue
+        elif op == "pop":
+            index = rng.randrange(-len(songs), len(songs))
+            assert queue.pop(index) == songs.pop(index)
+        elif op == "popleft":
+            assert queue.popleft() == songs.pop(0)
+        elif op == "del":
+            index = rng.randrange(-len(songs), len(songs))
+            del songs[index]
+            del queue[index]
+        elif op == "move":
+            source = rng.randrange(len(songs))
+            destination = rng.randrange(len(songs))
+            songs.insert(destination, songs.pop(source))
+            queue.move(source, destination)
+        elif op == "set":
+            index = rng.randrange(len(songs))
+            songs[index] = queue[index] = -n
+        assert len(queue) == len(songs)
+        assert sum(len(block) for block in queue._blocks) == len(songs)
+    assert list(queue) == songs
+    assert queue[5:25] == songs[5:25]
+
+
+def test_pop_from_empty_queue():
+    queue = TrackQueue()
+    with pytest.raises(IndexError):
+        queue.pop()
+    with pytest.raises(IndexError):
+        queue.pop(0)
@@ -0,0 +1,298 @@
+import asyncio
+import copy
+import random
+import time
+from collections import deque
+from collections.abc import MutableSequence
+from urllib.parse import urlparse, parse_qs
+
+import youtube_dl
+
+from cache import LRUCache, MISSING
+
+
+class TrackResolver:
+    """Caches DiscordUtils' ``get_video_data`` (search + stream extraction).
+
+    Results are kept under both the query and the resolved video URL, so a
+    song searched for again or met again in a playlist skips youtube_dl.
+    Entries live until shortly before YouTube's signed stream URL expires.
+    """
+
+    def __init__(self, get_video_data, *, maxsize=1024, default_ttl=3600, margin=300):
+        self._get_video_data = get_video_data
+        self.cache = LRUCache(maxsize)
+        self.default_ttl = default_ttl
+        self.margin = margin
+        self._inflight = {}
+
+    @staticmethod
+    def key(query, search):
+        return ('search' if search else 'url', ' '.join(query.casefold().split()) if search else query)
+
+    def ttl(self, song):
+        expire = parse_qs(urlparse(getattr(song, 'source', '') or '').query).get('expire')
+        if expire:
+            try:
+                return max(0, int(expire[0]) - time.time() - self.margin)
+            except ValueError:
+                pass
+        return self.default_ttl
+
+    async def get_video_data(self, url, search, bettersearch, loop):
+        key = self.key(url, search)
+        song = self.cache.get(key)
+        if song is MISSING:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = asyncio.ensure_future(self._get_video_data(url, search, bettersearch, loop))
+                future.add_done_callback(lambda f: self._store(key, f))
+            song = await asyncio.shield(future)
+        # Songs carry per-guild state such as is_looping, so never share one.
+        return copy.copy(song)
+
+    def _store(self, key, future):
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        song = future.result()
+        ttl = self.ttl(song)
+        if ttl:
+            self.cache.set(key, song, ttl)
+            if getattr(song, 'url', None):
+                self.cache.set(self.key(song.url, False), song, ttl)
+
+    async def resolve_many(self, urls, loop, *, workers=4):
+        """Resolve ``urls`` with at most ``workers`` extractions at once.
+
+        Yields songs in the original order (None for ones that failed) as
+        soon as each one and everything before it is ready.
+        """
+        semaphore = asyncio.Semaphore(workers)
+
+        async def resolve(url):
+            async with semaphore:
+                try:
+                    return await self.get_video_data(url, False, False, loop)
+                except Exception:
+                    return None
+
+        tasks = [asyncio.ensure_future(resolve(url)) for url in urls]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def refresh(self, song, loop, needed=0):
+        """Re-sign ``song.source`` in place if it expires within ``needed`` seconds.
+
+        DiscordUtils plays the stored ``source`` of the next song as is, so a
+        song that sat in the queue past its signed URL's expiry would fail.
+        """
+        if self.ttl(song) > needed:
+            return
+        self.cache.pop(self.key(song.url, False))
+        fresh = await self.get_video_data(song.url, False, False, loop)
+        song.source = fresh.source
+
+    def refresh_soon(self, song, loop, needed=0):
+        if self.ttl(song) <= needed:
+            asyncio.ensure_future(self.refresh(song, loop, needed)).add_done_callback(_consume)
+
+
+class TrackQueue(MutableSequence):
+    """A song queue stored as a list of small deques.
+
+    Pushing and popping at either end is O(1); indexing, removing, inserting
+    and moving by position only walk the blocks, O(n / block) instead of
+    shifting every song after the position.
+    """
+
+    block = 64
+
+    def __init__(self, songs=()):
+        self._blocks = [deque()]
+        self._len = 0
+        self.extend(songs)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+    def __repr__(self):
+        return f'TrackQueue({list(self)!r})'
+
+    def _locate(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('queue index out of range')
+        if index < self._len // 2:
+            for b, block in enumerate(self._blocks):
+                if index < len(block):
+                    return b, index
+                index -= len(block)
+        index = self._len - index
+        for b in range(len(self._blocks) - 1, -1, -1):
+            block = self._blocks[b]
+            if index <= len(block):
+                return b, len(block) - index
+            index -= len(block)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            songs = []
+            if start >= stop:
+                return songs
+            b, i = self._locate(start)
+            while len(songs) < stop - start:
+                block = self._blocks[b]
+                songs.extend(block[j] for j in range(i, min(len(block), i + stop - start - len(songs))))
+                b, i = b + 1, 0
+            return songs
+        b, i = self._locate(index)
+        return self._blocks[b][i]
+
+    def __setitem__(self, index, song):
+        b, i = self._locate(index)
+        self._blocks[b][i] = song
+
+    def __delitem__(self, index):
+        b, i = self._locate(index)
+        del self._blocks[b][i]
+        self._len -= 1
+        if not self._blocks[b] and len(self._blocks) > 1:
+            del self._blocks[b]
+
+    def insert(self, index, song):
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            return self.append(song)
+        b, i = self._locate(index)
+        block = self._blocks[b]
+        block.insert(i, song)
+        self._len += 1
+        if len(block) > 2 * self.block:
+            half = deque(block.popleft() for _ in range(self.block))
+            self._blocks.insert(b, half)
+
+    def append(self, song):
+        block = self._blocks[-1]
+        if len(block) >= self.block:
+            block = deque()
+            self._blocks.append(block)
+        block.append(song)
+        self._len += 1
+
+    def appendleft(self, song):
+        block = self._blocks[0]
+        if len(block) >= self.block:
+            block = deque()
+            self._blocks.insert(0, block)
+        block.appendleft(song)
+        self._len += 1
+
+    def pop(self, index=-1):
+        if not self._len:
+            raise IndexError('pop from an empty queue')
+        if index == 0:
+            return self.popleft()
+        if index == -1 or index == self._len - 1:
+            song = self._blocks[-1].pop()
+            self._len -= 1
+            if not self._blocks[-1] and len(self._blocks) > 1:
+                self._blocks.pop()
+            return song
+        song = self[index]
+        del self[index]
+        return song
+
+    def popleft(self):
+        if not self._len:
+            raise IndexError('pop from an empty queue')
+        song = self._blocks[0].popleft()
+        self._len -= 1
+        if not self._blocks[0] and len(self._blocks) > 1:
+            self._blocks.pop(0)
+        return song
+
+    def clear(self):
+        self._blocks = [deque()]
+        self._len = 0
+
+    def move(self, source, destination):
+        song = self.pop(source)
+        self.insert(destination, song)
+        return song
+
+    def _rebuild(self, songs):
+        self.clear()
+        self.extend(songs)
+
+    def shuffle(self, start=1):
+        # Index 0 is the song that is playing, so it stays put by default.
+        songs = list(self)
+        rest = songs[start:]
+        random.shuffle(rest)
+        self._rebuild(songs[:start] + rest)
+
+    def dedupe(self, key=lambda song: song.url):
+        seen = set()
+        songs = []
+        for song in self:
+            k = key(song)
+            if k not in seen:
+                seen.add(k)
+                songs.append(song)
+        removed = self._len - len(songs)
+        self._rebuild(songs)
+        return removed
+
+
+class QueueMap(dict):
+    """Guild id -> TrackQueue, converting any plain list stored into it."""
+
+    def __setitem__(self, guild_id, songs):
+        if not isinstance(songs, TrackQueue):
+            songs = TrackQueue(songs)
+        super().__setitem__(guild_id, songs)
+
+
+def is_playlist(query):
+    url = urlparse(query.strip())
+    if url.scheme not in ('http', 'https'):
+        return False
+    params = parse_qs(url.query)
+    return url.path.endswith('/playlist') or ('list' in params and 'v' not in params)
+
+
+def _flat_playlist(url):
+    with youtube_dl.YoutubeDL({'extract_flat': 'in_playlist', 'quiet': True, 'skip_download': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    entries = []
+    for entry in info.get('entries') or []:
+        link = entry.get('url') or entry.get('id')
+        if link and not link.startswith(('http://', 'https://')):
+            link = 'https://www.youtube.com/watch?v=' + link
+        if link:
+            entries.append(link)
+    return info.get('title') or url, entries
+
+
+async def playlist_entries(url, loop):
+    # Only lists the playlist; each song is resolved later via resolve_many.
+    return await loop.run_in_executor(None, _flat_playlist, url)
+
+
+def _consume(future):
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,92 @@
+class TriggerTrie:
+    """Prefix trie of trigger words; one walk finds every trigger a message starts with."""
+
+    def __init__(self, triggers=None):
+        self.root = {}
+        self.words = {}
+        for word, reaction in (triggers or {}).items():
+            self.add(word, reaction)
+
+    def add(self, word, reaction):
+        word = word.lower()
+        node = self.root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[None] = reaction
+        self.words[word] = reaction
+
+    def remove(self, word):
+        word = word.lower()
+        if word not in self.words:
+            return False
+        del self.words[word]
+        path = [self.root]
+        for ch in word:
+            path.append(path[-1][ch])
+        del path[-1][None]
+        # Prune branches that no longer lead to any trigger.
+        for depth in range(len(word), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][word[depth - 1]]
+        return True
+
+    def match(self, text):
+        # Only walks as far as the message keeps matching, however many
+        # triggers there are, and lowercases one character at a time.
+        reactions = []
+        node = self.root
+        for ch in text:
+            node = node.get(ch.lower())
+            if node is None:
+                break
+            if None in node:
+                reactions.append(node[None])
+        return reactions
+
+    def copy(self):
+        return TriggerTrie(self.words)
+
+
+# SQLiteCache entries always expire; this is as good as never.
+store_ttl = 10 * 365 * 86400
+
+
+class TriggerEngine:
+    """Default triggers plus per-guild ones, compiled into one trie per guild.
+
+    With a ``store`` (an SQLiteCache) each guild's triggers are saved as they
+    change and loaded back on startup.
+    """
+
+    def __init__(self, defaults, store=None):
+        self.defaults = TriggerTrie(defaults)
+        self.store = store
+        self._guilds = {}
+        if store is not None:
+            for guild_id, words in store.items():
+                self._guilds[int(guild_id)] = TriggerTrie(words)
+
+    def trie(self, guild_id):
+        return self._guilds.get(guild_id, self.defaults)
+
+    def match(self, guild_id, text):
+        return self.trie(guild_id).match(text)
+
+    def add(self, guild_id, word, reaction):
+        if guild_id not in self._guilds:
+            self._guilds[guild_id] = self.defaults.copy()
+        self._guilds[guild_id].add(word, reaction)
+        self._save(guild_id)
+
+    def remove(self, guild_id, word):
+        if guild_id not in self._guilds:
+            self._guilds[guild_id] = self.defaults.copy()
+        removed = self._guilds[guild_id].remove(word)
+        if removed:
+            self._save(guild_id)
+        return removed
+
+    def _save(self, guild_id):
+        if self.store is not None:
+            self.store.set(str(guild_id), self._guilds[guild_id].words, store_ttl)